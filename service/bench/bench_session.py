@@ -0,0 +1,108 @@
+"""
+Compares handshakes and wall-clock for a simulated
+`test-site` polling run using a fresh connection per
+call (the old module-level `requests.*` behaviour)
+against the pooled session in `transport.py`.
+
+usage:
+    python bench/bench_session.py --calls 300
+    python bench/bench_session.py --url https://api.cursion.dev/v1/ops/site
+"""
+
+import argparse, sys, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+import requests
+import urllib3.connection
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.cursion.transport import build_session
+
+
+# count every new TCP (and TLS) connection opened by urllib3
+handshakes = {'count': 0}
+_new_conn = urllib3.connection.HTTPConnection._new_conn
+
+def _counting_new_conn(self):
+    handshakes['count'] += 1
+    return _new_conn(self)
+
+urllib3.connection.HTTPConnection._new_conn = _counting_new_conn
+
+
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    """
+    Minimal keep-alive JSON endpoint standing in for the API
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"time_completed": null}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+
+
+def run(label: str, get, url: str, calls: int) -> dict:
+
+    """
+    Runs "calls" sequential GETs with the passed
+    callable and records handshakes & wall-clock
+    """
+
+    handshakes['count'] = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        get(url).content
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'label': label,
+        'calls': calls,
+        'handshakes': handshakes['count'],
+        'seconds': round(elapsed, 3),
+        'ms_per_call': round(elapsed / calls * 1000, 3),
+    }
+    print(
+        f"{label:<10} calls={result['calls']:<6} handshakes={result['handshakes']:<6} "
+        f"wall={result['seconds']}s ({result['ms_per_call']} ms/call)"
+    )
+    return result
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=300)
+    parser.add_argument('--url', default=None)
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/v1/ops/scan'
+
+    session = build_session()
+    run('before', lambda u: requests.get(url=u), url, args.calls)
+    run('after', lambda u: session.get(url=u), url, args.calls)
+
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Tracks cold-start time of the `cursion` entry point per
+command. Each command is run in a fresh interpreter:
+    - wall: median wall-clock of "--runs" invocations
+    - imports: total `-X importtime` cost of the run
+    - heaviest: the slowest top-level import
+
+usage:
+    python bench/bench_startup.py
+    python bench/bench_startup.py --save bench/startup.json
+    python bench/bench_startup.py --baseline bench/startup.json --tolerance 0.25
+"""
+
+import argparse, json, os, statistics, subprocess, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+ENTRY = 'from src.cursion.root import root; root()'
+
+# commands run without touching the network
+COMMANDS = [
+    ['--help'],
+    ['check'],
+    ['get-sites', '--help'],
+    ['test-site', '--help'],
+    ['testcase-site', '--help'],
+]
+
+
+
+
+def run(args: list, importtime: bool=False) -> subprocess.CompletedProcess:
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', ENTRY, *args]
+    return subprocess.run(
+        cmd, cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '0'}
+    )
+
+
+
+
+def parse_importtime(stderr: str) -> dict:
+
+    """
+    Returns the total import time and the heaviest
+    top-level import (in ms) from `-X importtime` output
+    """
+
+    total, heaviest = 0.0, ('', 0.0)
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if not line.startswith('import time:') or len(parts) != 3:
+            continue
+        cumulative, name = parts[1].strip(), parts[2]
+        # only top-level imports (not indented) add to the total
+        if not cumulative.isdigit() or name.startswith('  '):
+            continue
+        ms = int(cumulative) / 1000
+        total += ms
+        if ms > heaviest[1]:
+            heaviest = (name.strip(), ms)
+
+    return {'imports_ms': round(total, 1), 'heaviest': heaviest[0], 'heaviest_ms': round(heaviest[1], 1)}
+
+
+
+
+def bench(args: list, runs: int) -> dict:
+    walls = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run(args)
+        walls.append((time.perf_counter() - start) * 1000)
+
+    result = {'command': ' '.join(args), 'wall_ms': round(statistics.median(walls), 1)}
+    result.update(parse_importtime(run(args, importtime=True).stderr))
+    return result
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--save', default=None)
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    # warming bytecode caches so only import cost is measured
+    run(['--help'])
+
+    results = [bench(command, args.runs) for command in COMMANDS]
+    print(f"{'command':<24} {'wall_ms':>8} {'imports_ms':>11}  heaviest")
+    for r in results:
+        print(f"{r['command']:<24} {r['wall_ms']:>8} {r['imports_ms']:>11}  {r['heaviest']} ({r['heaviest_ms']} ms)")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2) + '\n')
+
+    # failing when any command regressed past the tolerance
+    if args.baseline:
+        baseline = {r['command']: r for r in json.loads(Path(args.baseline).read_text())}
+        regressed = [
+            r['command'] for r in results
+            if r['command'] in baseline
+            and r['wall_ms'] > baseline[r['command']]['wall_ms'] * (1 + args.tolerance)
+        ]
+        if regressed:
+            print(f'regressed: {regressed}')
+            sys.exit(1)
+
+
+
+
+if __name__ == '__main__':
+    main()
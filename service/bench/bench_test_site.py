@@ -0,0 +1,99 @@
+"""
+Runs the `api_test_site` (or `api_testcase_site`) flow
+end-to-end against the bundled mock Cursion API and
+reports wall-clock plus the requests & connections the
+mock received - no network needed.
+
+usage:
+    python bench/bench_test_site.py --pages 300 --delay 5
+    python bench/bench_test_site.py --pages 300 --latency 0.05 --pipeline
+    python bench/bench_test_site.py --testcase
+    python bench/bench_test_site.py --pages 50 --failure-rate 0.1
+    python bench/bench_test_site.py --pages 50 --delay 5 --budget 20
+"""
+
+import argparse, contextlib, io, json, os, sys, threading, time
+from pathlib import Path
+from urllib.request import urlopen
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.cursion.mock import build_mock_server
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=3)
+    parser.add_argument('--delay-jitter', type=float, default=1)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--pipeline', action='store_true')
+    parser.add_argument('--testcase', action='store_true')
+    parser.add_argument('--budget', type=float, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    # starting the mock
+    server = build_mock_server(
+        port=0,
+        pages=args.pages,
+        delay=args.delay,
+        delay_jitter=args.delay_jitter,
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        page_size=args.page_size,
+        seed=1,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state = server.state
+
+    # pointing the CLI at the mock before importing it
+    os.environ['API_ROOT'] = state.root
+    os.environ['API_KEY'] = 'mock-key-0000000000000000'
+    from src.cursion import api, transport
+    from src.cursion.budget import BudgetExhausted
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+        if args.testcase:
+            result = api.api_testcase_site(
+                site_id=state.default_site['id'],
+                case_id=state.default_case['id'],
+                updates=[],
+                concurrency=args.concurrency,
+            )
+        else:
+            try:
+                result = api.api_test_site(
+                    site_id=state.default_site['id'],
+                    concurrency=args.concurrency,
+                    pipeline=args.pipeline,
+                    budget=args.budget,
+                )
+            except BudgetExhausted as e:
+                result = {'exhausted': e.phase, 'progress': e.progress}
+    elapsed = time.perf_counter() - start
+
+    stats = json.loads(urlopen(f'{state.root}/__mock__/stats').read())
+    print(json.dumps({
+        'result': result,
+        'pages': args.pages,
+        'seconds': round(elapsed, 2),
+        'requests': stats['requests'] - 1,
+        'connections': stats['connections'] - 1,
+        'failures': stats['failures'],
+        'bytes_sent': stats['bytes_sent'],
+        'client': transport.get_stats(),
+        'routes': stats['routes'],
+    }, indent=2))
+
+
+
+
+if __name__ == '__main__':
+    main()
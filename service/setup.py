@@ -14,10 +14,10 @@ setup(
         'rich',
         'typer',
     ],
-    entry_points={
-        'console_scripts': [
-            'cursion=src.cursion.root:root'
-        ]
+    extras_require={
+        'async': ['httpx'],
+        'fast': ['orjson'],
+        'test': ['pytest'],
     },
     long_description=long_description,
     long_description_content_type='text/markdown'
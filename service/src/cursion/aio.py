@@ -0,0 +1,699 @@
+import asyncio, json, random
+from rich import print as rprint
+from .config import POOL_SIZE, POLL_CONCURRENCY, CONNECT_TIMEOUT, READ_TIMEOUT
+from .api import (
+    CURSION_API_BASE_URL, CURSION_API_TOKEN,
+    get_results, parse_updates, print_test_result, print_testcase_result,
+    print_create_error
+)
+from .scheduler import PollScheduler
+from .probe import PROBE_TIMEOUT, is_available
+from .response import ApiResponse
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+
+
+class AsyncCursionClient:
+
+    """
+    Native asyncio client exposing the same operations as
+    `api.py` - every method is a coroutine sharing one
+    pooled `httpx.AsyncClient`. Requires the "async" extra:
+        pip install cursion[async]
+
+    usage:
+        async with AsyncCursionClient(api_key=...) as client:
+            passed = await client.test_site(site_id=...)
+    """
+
+    def __init__(
+            self,
+            api_key: str=None,
+            api_root: str=None,
+            pool_size: int=POOL_SIZE,
+            concurrency: int=POLL_CONCURRENCY,
+        ):
+        if httpx is None:
+            raise ImportError(
+                'AsyncCursionClient requires httpx - '
+                'install with `pip install cursion[async]`'
+            )
+
+        # setup configs
+        self.base_url = (
+            f'{api_root}/v1/ops' if api_root is not None
+            else CURSION_API_BASE_URL
+        )
+        self.headers = {
+            "content-type": "application/json",
+            "Authorization": (
+                f'Token {api_key}' if api_key is not None
+                else CURSION_API_TOKEN
+            )
+        }
+        self.concurrency = concurrency
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+    async def request(
+            self,
+            method: str,
+            path: str,
+            params: dict=None,
+            data: dict=None
+        ) -> dict:
+
+        """
+        Sends a request to the Cursion API and formats
+        the response like `api.format_response`. "path" 
+        may also be a full url (i.e. a "next" link)
+        """
+
+        # dropping unset params - matching `requests`
+        if params is not None:
+            params = {k: v for k, v in params.items() if v is not None}
+
+        # send the request
+        res = await self.client.request(
+            method=method,
+            url=path if path.startswith('http') else f'{self.base_url}{path}',
+            params=params,
+            content=json.dumps(data) if data is not None else None,
+        )
+
+        # format response
+        resp = ApiResponse.from_response(res)
+
+        return resp
+
+
+    async def iter_results(self, path: str, params: dict=None):
+
+        """
+        Lazily yields every object in a paginated listing -
+        following "next" links and prefetching the following
+        page while the current one is consumed
+        """
+
+        task = asyncio.ensure_future(self.request('GET', path, params=params))
+        try:
+            while task is not None:
+                resp = await task
+                if not resp['success']:
+                    raise Exception(f'- Cursion API Error : {resp["data"]} -')
+
+                # prefetching the next page
+                data = resp['data']
+                next_url = data.get('next') if isinstance(data, dict) else None
+                task = asyncio.ensure_future(self.request('GET', next_url)) if next_url else None
+
+                # yielding records from the current page
+                if isinstance(data, dict) and 'results' not in data:
+                    yield data
+                else:
+                    for item in get_results(data):
+                        yield item
+        finally:
+            if task is not None:
+                task.cancel()
+
+
+    # --- Sites --- #
+
+    async def add_site(self, site_url: str, page_urls: list=None) -> dict:
+        return await self.request('POST', '/site', data={
+            "site_url": site_url,
+            "page_urls": page_urls,
+        })
+
+
+    async def crawl_site(self, site_id: str) -> dict:
+        return await self.request('POST', f'/site/{site_id}/crawl')
+
+
+    async def get_sites(self, site_id: str=None) -> dict:
+        return await self.request('GET', '/site', params={
+            "site_id": site_id,
+        })
+
+
+    def iter_sites(self):
+        return self.iter_results('/site')
+
+
+    async def delete_site(self, site_id: str) -> dict:
+        return await self.request('DELETE', f'/site/{site_id}')
+
+
+    # --- Pages --- #
+
+    async def add_page(
+            self,
+            site_id: str,
+            page_url: str=None,
+            page_urls: list=None
+        ) -> dict:
+        return await self.request('POST', '/page', data={
+            "site_id": site_id,
+            "page_url": page_url,
+            "page_urls": page_urls,
+        })
+
+
+    async def get_pages(self, site_id: str=None, page_id: str=None) -> dict:
+        return await self.request('GET', '/page', params={
+            "site_id": site_id,
+            "page_id": page_id,
+            "lean": "true",
+        })
+
+
+    def iter_pages(self, site_id: str):
+        return self.iter_results('/page', params={
+            "site_id": site_id,
+            "lean": "true",
+        })
+
+
+    async def delete_page(self, page_id: str) -> dict:
+        return await self.request('DELETE', f'/page/{page_id}')
+
+
+    # --- Scans --- #
+
+    async def scan_site(self, site_id: str) -> dict:
+        return await self.request('POST', '/scan', data={
+            "site_id": site_id,
+        })
+
+
+    async def scan_page(self, page_id: str) -> dict:
+        return await self.request('POST', '/scan', data={
+            "page_id": page_id,
+        })
+
+
+    async def get_scans(self, page_id: str=None, scan_id: str=None) -> dict:
+        return await self.request('GET', '/scan', params={
+            "scan_id": scan_id,
+            "page_id": page_id,
+            "lean": "true",
+        })
+
+
+    def iter_scans(self, page_id: str):
+        return self.iter_results('/scan', params={
+            "page_id": page_id,
+            "lean": "true",
+        })
+
+
+    # --- Tests --- #
+
+    async def test_page(self, page_id: str, pre_scan: str, post_scan: str) -> dict:
+        return await self.request('POST', '/test', data={
+            "page_id": page_id,
+            "pre_scan": pre_scan,
+            "post_scan": post_scan,
+        })
+
+
+    async def get_tests(self, page_id: str=None, test_id: str=None) -> dict:
+        return await self.request('GET', '/test', params={
+            "test_id": test_id,
+            "page_id": page_id,
+            "lean": "true",
+        })
+
+
+    def iter_tests(self, page_id: str):
+        return self.iter_results('/test', params={
+            "page_id": page_id,
+            "lean": "true",
+        })
+
+
+    # --- Cases & Testcases --- #
+
+    async def get_cases(self, site_id: str=None, case_id: str=None) -> dict:
+        return await self.request('GET', '/case', params={
+            "case_id": case_id,
+            "site_id": site_id,
+        })
+
+
+    async def get_testcases(self, site_id: str=None, testcase_id: str=None) -> dict:
+        return await self.request('GET', '/testcase', params={
+            "testcase_id": testcase_id,
+            "site_id": site_id,
+        })
+
+
+    def iter_cases(self, site_id: str=None):
+        return self.iter_results('/case', params={
+            "site_id": site_id,
+        })
+
+
+    def iter_testcases(self, site_id: str=None):
+        return self.iter_results('/testcase', params={
+            "site_id": site_id,
+        })
+
+
+    async def add_testcases(self, site_id: str, case_id: str, updates: list=None) -> dict:
+        return await self.request('POST', '/testcase', data={
+            "case_id": case_id,
+            "site_id": site_id,
+            "updates": updates,
+        })
+
+
+    # --- Flows --- #
+
+    async def get_status(self, id: str, obj: str) -> dict:
+
+        """
+        Retrieves the current state of a single
+        `Scan`, `Test` or `Testcase` object - or an
+        empty dict when the API could not be reached,
+        leaving the object pending
+        """
+
+        try:
+            if obj == 'scan':
+                return (await self.get_scans(scan_id=id))['data']
+            if obj == 'test':
+                return (await self.get_tests(test_id=id))['data']
+            if obj == 'testcase':
+                return (await self.get_testcases(testcase_id=id))['data']
+        except (httpx.HTTPError, ValueError):
+            return {}
+
+
+    async def create_object(self, send, **kwargs) -> tuple:
+
+        """
+        Async version of `api.create_object` - returns the
+        new object's (id, None), or (None, error)
+        """
+
+        try:
+            resp = await send(**kwargs)
+        except httpx.HTTPError as e:
+            return None, str(e) or type(e).__name__
+        if not resp['success']:
+            return None, resp['data']
+
+        return str(resp['data']['ids'][0]), None
+
+
+    async def get_listing(self, page_id: str, obj: str) -> list:
+        try:
+            if obj == 'scan':
+                return get_results((await self.get_scans(page_id=page_id))['data'])
+            if obj == 'test':
+                return get_results((await self.get_tests(page_id=page_id))['data'])
+        except (httpx.HTTPError, ValueError):
+            pass
+        return []
+
+
+    async def resolve_statuses(
+            self,
+            pending: list,
+            obj: str,
+            semaphore: asyncio.Semaphore,
+            pages: dict=None,
+            site_id: str=None
+        ) -> dict:
+
+        """
+        Async version of `api.resolve_statuses` - site listing,
+        then per-page listings, then per-id GETs
+        """
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        resolved = {}
+        lookup = {str(id): id for id in pending}
+
+        # 1. site-level listing covers every "latest_scan"
+        if obj == 'scan' and site_id is not None:
+            try:
+                async for page in self.iter_pages(site_id=site_id):
+                    scan = (page.get('info') or {}).get('latest_scan') or {}
+                    if str(scan.get('id')) in lookup and 'time_completed' in scan:
+                        resolved[lookup[str(scan['id'])]] = scan
+            except Exception:
+                # falling through to the narrower listings
+                pass
+
+        # 2. page-level listings for the remaining ids
+        if pages is not None:
+            page_ids = list(dict.fromkeys(
+                str(pages[id]) for id in pending
+                if id not in resolved and pages.get(id) is not None
+            ))
+            listings = await asyncio.gather(*[
+                bounded(self.get_listing(page_id=page_id, obj=obj))
+                for page_id in page_ids
+            ])
+            for listing in listings:
+                for item in listing:
+                    id = lookup.get(str(item.get('id')))
+                    if id is not None and id not in resolved:
+                        resolved[id] = item
+
+        # 3. falling back to per-id GETs
+        remaining = [id for id in pending if id not in resolved]
+        statuses = await asyncio.gather(*[
+            bounded(self.get_status(id=id, obj=obj)) for id in remaining
+        ])
+        for id, data in zip(remaining, statuses):
+            resolved[id] = data
+
+        return resolved
+
+
+    async def wait_for_completion(
+            self,
+            ids: list,
+            obj: str,
+            pages: dict=None,
+            site_id: str=None,
+            max_wait_time: int=900
+        ) -> dict:
+
+        """
+        Async version of `api.wait_for_completion`.
+        Returns the completed objects by id.
+        """
+
+        completions = {}
+        pending = list(dict.fromkeys(ids))
+        scheduler = PollScheduler(max_wait_time=max_wait_time)
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        while len(pending) > 0:
+            # checking status of all pending objs
+            statuses = await self.resolve_statuses(
+                pending=pending,
+                obj=obj,
+                semaphore=semaphore,
+                pages=pages,
+                site_id=site_id
+            )
+            completed = 0
+            for id in list(pending):
+                # alerting completion
+                if isinstance(statuses.get(id), dict) and statuses[id].get('time_completed') is not None:
+                    rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' {obj} completed -> {id}')
+                    completions[id] = statuses[id]
+                    pending.remove(id)
+                    completed += 1
+
+            # waiting for next round or deadline
+            scheduler.observe(completed=completed)
+            if len(pending) == 0:
+                break
+            if scheduler.expired():
+                rprint(
+                    '[red bold]' + u'\u2718' + '[/red bold]' +
+                    f' max wait time reached - {len(pending)} {obj}(s) still running'
+                )
+                break
+            # a sleep cut short by the deadline is followed by one final round
+            await asyncio.sleep(scheduler.next_interval())
+
+        return completions
+
+
+    async def probe_url(self, url: str, timeout: tuple=PROBE_TIMEOUT) -> int:
+
+        """
+        Async version of `probe.probe_url` - HEAD with a
+        streamed GET fallback, never reading the body
+        """
+
+        _timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            res = await self.client.head(url, timeout=_timeout, follow_redirects=True)
+            if res.status_code in (405, 501):
+                async with self.client.stream(
+                        'GET', url, timeout=_timeout, follow_redirects=True
+                    ) as res:
+                    pass
+            return res.status_code
+        except httpx.HTTPError:
+            return None
+
+
+    async def wait_for_site(
+            self, 
+            site_url: str, 
+            max_wait_time: int=900, 
+            probe_urls: list=None
+        ) -> bool:
+
+        """
+        Async version of `api.check_site_availability`
+        """
+
+        print(f'checking site availablity...')
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait_time
+        pending = list(dict.fromkeys([site_url, *(probe_urls or [])]))
+        interval = 1
+        available = False
+        while loop.time() < deadline:
+            remaining = deadline - loop.time()
+            timeout = tuple(min(t, remaining) for t in PROBE_TIMEOUT)
+            statuses = await asyncio.gather(*[self.probe_url(url, timeout=timeout) for url in pending])
+            pending = [url for url, status in zip(pending, statuses) if not is_available(status)]
+            if len(pending) == 0:
+                available = True
+                break
+            # backing off before next attempt
+            await asyncio.sleep(max(0, min(deadline - loop.time(), interval * random.uniform(0.8, 1.2))))
+            interval = min(30, interval * 2)
+
+        # determine if timeout
+        if not available:
+            rprint(
+                '[red bold]' + u'\u2718' + '[/red bold]' +
+                ' max wait time reached - proceeding with caution...'
+            )
+            return False
+
+        rprint(
+            '[green bold]' + u'\u2714' + '[/green bold]'
+            + ' site is available'
+        )
+        return True
+
+
+    async def test_site(
+            self,
+            site_id: str,
+            max_wait_time: int=900,
+            threshold: int=95,
+            probe_urls: list=None
+        ) -> bool:
+
+        """
+        Async version of `api.api_test_site`
+        """
+
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        # 1. get the site
+        site = (await self.get_sites(site_id=site_id))['data']
+
+        # 2. Check for crawl completion
+        await self.wait_for_site(
+            site_url=site['site_url'], 
+            max_wait_time=max_wait_time,
+            probe_urls=probe_urls
+        )
+
+        # 3. Get all `Pages` for associated `Site`
+        print(f'\nretrieving pages...')
+        pages = [page async for page in self.iter_pages(site_id=str(site['id']))]
+        rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' retrieved pages')
+
+        # 4. Get all "pre_scan" id's for each `Page`
+        pre_scan_pages = {
+            str(page['info']['latest_scan']['id']): str(page['id'])
+            for page in pages
+        }
+
+        # 5. Check for all "pre_scan" completion
+        print(f'\nchecking pre_scans for each page...')
+        await self.wait_for_completion(
+            ids=list(pre_scan_pages), obj='scan',
+            pages=pre_scan_pages, site_id=str(site['id']),
+            max_wait_time=max_wait_time
+        )
+
+        # 6. Create new "post_scans" for each `Page`
+        print(f'\ncreating post_scans for each page...')
+        resp = await self.scan_site(site_id=str(site['id']))
+        if not resp['success']:
+            rprint(resp)
+            return False
+        post_scan_ids = resp['data']['ids']
+        rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' post_scans created')
+
+        # 7. Check for all "post_scan" completion
+        print(f'\nchecking post_scans for each page...')
+        await self.wait_for_completion(
+            ids=post_scan_ids, obj='scan',
+            site_id=str(site['id']),
+            max_wait_time=max_wait_time
+        )
+
+        # 8. Create new `Test` for each `Page`
+        pages = [page async for page in self.iter_pages(site_id=str(site['id']))]
+        page_pre_scans = {page_id: pre_scan_id for pre_scan_id, page_id in pre_scan_pages.items()}
+        created = await asyncio.gather(*[
+            bounded(self.create_object(
+                self.test_page,
+                page_id=str(page['id']),
+                pre_scan=page_pre_scans.get(str(page['id'])),
+                post_scan=str(page['info']['latest_scan']['id']),
+            )) for page in pages
+        ])
+        test_ids = []
+        test_pages = {}
+        failed = {}
+        for page, (test_id, error) in zip(pages, created):
+            if error is not None:
+                failed[page['page_url']] = error
+                print_create_error(stage='test', page_url=page['page_url'], error=error)
+                continue
+            # record test_id
+            test_ids.append(test_id)
+            test_pages[test_id] = str(page['id'])
+            rprint(str(f'\ntesting page {page['page_url']}\
+                \n test_id    : {test_id}\
+                \n pre_scan   : {page_pre_scans.get(str(page['id']))}\
+                \n post_scan  : {page["info"]["latest_scan"]["id"]}'
+            ))
+
+        # 9. Check for all `Test` completion
+        print(f'\nchecking test completion for each page...')
+        completions = await self.wait_for_completion(
+            ids=test_ids, obj='test',
+            pages=test_pages,
+            max_wait_time=max_wait_time
+        )
+
+        # collecting scores - reusing those already polled
+        async def get_score(test_id: str) -> float:
+            score = (completions.get(test_id) or {}).get('score')
+            if score is None:
+                score = (await self.get_tests(test_id=test_id))['data']['score']
+            return score
+
+        scores = await asyncio.gather(*[bounded(get_score(test_id)) for test_id in test_ids])
+
+        # checking scores
+        success = True
+        print('\nTest results:')
+        for test_id, score in zip(test_ids, scores):
+            if not print_test_result(test_id=test_id, score=score, threshold=threshold, site_id=site_id):
+                success = False
+        for page_url, error in failed.items():
+            rprint(' [red bold]' + u'\u2718' + '[/red bold]' + f' failed : {page_url} - {error}')
+            success = False
+
+        # returning results
+        return success
+
+
+    async def testcase_site(
+            self,
+            site_id: str,
+            case_id: str,
+            max_wait_time: int=900,
+            updates: list=None,
+            probe_urls: list=None
+        ) -> bool:
+
+        """
+        Async version of `api.api_testcase_site`
+        """
+
+        # 1. get the site
+        site = (await self.get_sites(site_id=site_id))['data']
+
+        # 2. Wait for `Site` to be available
+        await self.wait_for_site(
+            site_url=site['site_url'], 
+            max_wait_time=max_wait_time,
+            probe_urls=probe_urls
+        )
+
+        # 3. Adjust steps data
+        print(f'\nadjusting step data...')
+        _updates = parse_updates(updates)
+        if _updates is None:
+            return False
+        rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' step data updated')
+
+        # 4. Create new `Testcase`
+        testcase_data = await self.add_testcases(
+            case_id=case_id,
+            site_id=site_id,
+            updates=_updates
+        )
+
+        if not testcase_data['success']:
+            rprint(testcase_data)
+            return False
+
+        # saving testcase_id
+        testcase_id = testcase_data['data']['id']
+
+        # 5. Check for `Testcase` completion
+        print(f'\nwaiting for Testcase completion...')
+        completions = await self.wait_for_completion(
+            ids=[testcase_id], obj='testcase',
+            max_wait_time=max_wait_time
+        )
+        testcase = completions.get(testcase_id)
+        if testcase is None:
+            testcase = (await self.get_testcases(testcase_id=testcase_id))['data']
+
+        # returning results
+        return print_testcase_result(testcase=testcase, testcase_id=testcase_id)
@@ -1,38 +1,49 @@
-import requests, json, os, time
-from dotenv import load_dotenv
-from pathlib import Path
+import json, time
 from rich import print as rprint
-
-env_file = Path(str(Path.home()) + '/cursion/.env')
-
-load_dotenv(dotenv_path=env_file)
-
-# import env vars
-CURSION_API_BASE_URL = f'{os.getenv('API_ROOT') if os.getenv('API_ROOT') is not None else 'https://api.cursion.dev'}/v1/ops'
-CURSION_API_TOKEN = f'Token {os.getenv('API_KEY')}'
+from .config import API_ROOT, API_KEY, POLL_CONCURRENCY, ADD_PAGES_CHUNK_SIZE
+from .transport import send_request, ensure_pool_size, set_max_in_flight
+from requests import RequestException
+from .output import capture_thread_output
+from .probe import wait_for_urls
+from .scheduler import PollScheduler
+from .cache import cache_get, cache_put, cache_invalidate
+from .budget import RunBudget, BudgetExhausted
+from .runs import RunCheckpoint, PhaseTimedOut, prune_runs
+from .fingerprint import fetch_fingerprints, load_index, record_fingerprints
+from .sharding import in_shard
+from .tracing import span, emit
+from .response import ApiResponse, get_fields, project
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import nullcontext
+
+# api configs
+CURSION_API_BASE_URL = f'{API_ROOT}/v1/ops'
+CURSION_API_TOKEN = API_KEY
 headers = {
    "content-type": "application/json",
    "Authorization" : CURSION_API_TOKEN
 }
 
+# fields read from polled objects & `Page` listings
+STATUS_FIELDS = {
+    'scan': ['time_completed'],
+    'test': ['time_completed', 'score'],
+    'testcase': ['time_completed'],
+}
+PAGE_FIELDS = ['page_url', 'info.latest_scan.id']
+LATEST_SCAN_FIELDS = ['info.latest_scan.id', 'info.latest_scan.time_completed']
 
 
 
-def format_response(response: dict) -> dict:
-
-    # checking response for error
-    success = True
-    if not str(response.status_code).startswith('2'):
-        success = False
 
-    # retrieve response data
-    json_response = response.json()
+def format_response(response: dict, fields: list=None) -> ApiResponse:
 
-    # format response
-    resp = {
-        'success': success,
-        'data': json_response
-    }
+    # wrap response - "data" is decoded on first access
+    # (and trimmed to "fields" if passed)
+    resp = ApiResponse.from_response(
+        response, 
+        transform=(lambda data: project(data, fields)) if fields else None
+    )
 
     return resp
 
@@ -53,9 +64,9 @@ def check_headers(api_key:str = None):
             )
             return None
 
-        # updated header if api_key is present
-        headers["Authorization"] = f'Token {api_key}'
-        return headers
+        # building headers for this call only - the module
+        # `headers` outlive the command (e.g. in `cursion serve`)
+        return {**headers, "Authorization": f'Token {api_key}'}
 
     # return unchanged headers 
     else:
@@ -64,6 +75,65 @@ def check_headers(api_key:str = None):
 
 
 
+def get_executor(concurrency: int, executor: ThreadPoolExecutor=None):
+
+    """
+    Returns a context for the shared "executor" when one 
+    is passed - else for a new pool of "concurrency" threads
+    """
+
+    if executor is not None:
+        return nullcontext(executor)
+
+    return ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+
+
+
+def send_cached_get(
+        resource: str,
+        url: str,
+        headers: dict,
+        params: dict=None,
+        cache: bool=False,
+        refresh: bool=False,
+        fields: list=None
+    ) -> dict:
+
+    """
+    Sends a GET and formats the response - serving it from
+    (and storing it in) the on-disk cache when "cache" is 
+    True. "refresh" skips the lookup but still stores.
+    """
+
+    token = (headers or {}).get('Authorization')
+
+    # checking cache
+    if cache and not refresh:
+        resp = cache_get(resource, url, params, token)
+        if resp is not None:
+            return resp
+
+    # send the request
+    res = send_request(
+        'GET',
+        url=url, 
+        headers=headers, 
+        params=params
+    )
+
+    # format response
+    resp = format_response(res, fields=fields)
+
+    # storing in cache
+    if cache:
+        cache_put(resource, url, params, token, response=resp)
+
+    return resp
+
+
+
+
 def api_add_site(*args, **kwargs):
 
     """ 
@@ -90,7 +160,8 @@ def api_add_site(*args, **kwargs):
     headers = check_headers(api_key=api_key)
         
     # send the request
-    res = requests.post(
+    res = send_request(
+        'POST',
         url=url, 
         headers=headers, 
         data=json.dumps(data)
@@ -99,6 +170,9 @@ def api_add_site(*args, **kwargs):
     # format response
     resp = format_response(res)
 
+    # invalidate cached listings
+    cache_invalidate('site', 'page')
+
     # return object as dict
     return resp
 
@@ -124,7 +198,8 @@ def api_crawl_site(*args, **kwargs):
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.post(
+    res = send_request(
+        'POST',
         url=url, 
         headers=headers, 
     )
@@ -132,6 +207,9 @@ def api_crawl_site(*args, **kwargs):
     # format response
     resp = format_response(res)
 
+    # invalidate cached listings
+    cache_invalidate('page')
+
     # return object as dict
     return resp
 
@@ -148,27 +226,32 @@ def api_get_sites(*args, **kwargs):
     # get kwargs
     site_id = kwargs.get('site_id')
     api_key = kwargs.get('api_key')
+    fields = get_fields(kwargs.get('fields'))
+    cache = kwargs.get('cache', False)
+    refresh = kwargs.get('refresh', False)
 
     # setup configs
     url = f'{CURSION_API_BASE_URL}/site'
 
     params = {
         "site_id": site_id,
+        'fields': ','.join(fields) if fields else None,  # OPTIONAL projection
     }
 
     # check headers for API KEY
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.get(
+    resp = send_cached_get(
+        resource='site',
         url=url, 
         headers=headers, 
-        params=params
+        params=params,
+        cache=cache,
+        refresh=refresh,
+        fields=fields
     )
 
-    # format response
-    resp = format_response(res)
-
     # return object as dict
     return resp
 
@@ -193,7 +276,8 @@ def api_delete_site(*args, **kwargs):
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.delete(
+    res = send_request(
+        'DELETE',
         url=url, 
         headers=headers, 
     )
@@ -201,6 +285,9 @@ def api_delete_site(*args, **kwargs):
     # format response
     resp = format_response(res)
 
+    # invalidate cached listings
+    cache_invalidate('site', 'page', 'case', 'testcase')
+
     # return object as dict
     return resp
 
@@ -234,7 +321,8 @@ def api_add_page(*args, **kwargs):
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.post(
+    res = send_request(
+        'POST',
         url=url, 
         headers=headers, 
         data=json.dumps(data)
@@ -243,12 +331,90 @@ def api_add_page(*args, **kwargs):
     # format response
     resp = format_response(res)
 
+    # invalidate cached listings
+    cache_invalidate('page')
+
     # return object as dict
     return resp
 
 
 
 
+def api_add_pages(
+        site_id: str,
+        page_urls,
+        chunk_size: int=ADD_PAGES_CHUNK_SIZE,
+        concurrency: int=4,
+        dedupe: bool=True,
+        api_key: str=None
+    ) -> dict:
+
+    """
+    This method adds every URL in "page_urls" (any iterable
+    - e.g. `sitemap.iter_urls`) to the `Site` in chunks of
+    "chunk_size" via `api_add_page`, with up to "concurrency"
+    chunks in flight - the input is only read as fast as
+    chunks are sent. With "dedupe", URLs already on the 
+    `Site` (or repeated in the input) are skipped. Returns 
+    the counts of added, skipped & failed URLs plus errors.
+    """
+
+    def send(chunk: list) -> tuple:
+        try:
+            resp = api_add_page(site_id=site_id, page_urls=chunk, api_key=api_key)
+            return chunk, resp['success'], None if resp['success'] else resp['data']
+        except RequestException as e:
+            return chunk, False, str(e)
+
+    def collect(futures: set) -> None:
+        for future in futures:
+            chunk, success, error = future.result()
+            if success:
+                counts['added'] += len(chunk)
+            else:
+                counts['failed'] += len(chunk)
+                counts['errors'].append({'first_url': chunk[0], 'urls': len(chunk), 'error': error})
+            print(f'added {counts["added"]} pages ({counts["failed"]} failed)...')
+
+    counts = {'added': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+
+    # getting existing `Pages` to skip
+    seen = set()
+    if dedupe:
+        print('getting existing pages...')
+        for page in iter_pages(site_id=site_id, api_key=api_key, fields=['page_url']):
+            seen.add(page['page_url'])
+        print(f'found {len(seen)} existing pages')
+
+    # sending chunks - at most "concurrency" in flight
+    with span('phase', phase='add_pages', site_id=site_id) as fields, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        pending = set()
+        chunk = []
+        for url in page_urls:
+            if dedupe:
+                if url in seen:
+                    counts['skipped'] += 1
+                    continue
+                seen.add(url)
+            chunk.append(url)
+            if len(chunk) < chunk_size:
+                continue
+            if len(pending) >= max(1, concurrency):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(send, chunk))
+            chunk = []
+        if chunk:
+            pending.add(executor.submit(send, chunk))
+        collect(wait(pending).done)
+        fields.update({k: v for k, v in counts.items() if k != 'errors'})
+
+    return counts
+
+
+
+
 def api_get_pages(*args, **kwargs):
 
     """ 
@@ -260,6 +426,9 @@ def api_get_pages(*args, **kwargs):
     site_id = kwargs.get('site_id')
     page_id = kwargs.get('page_id')
     api_key = kwargs.get('api_key')
+    fields = get_fields(kwargs.get('fields'))
+    cache = kwargs.get('cache', False)
+    refresh = kwargs.get('refresh', False)
 
     # setup configs
     url = f'{CURSION_API_BASE_URL}/page'
@@ -267,22 +436,24 @@ def api_get_pages(*args, **kwargs):
     params = {
         "site_id": site_id,
         "page_id": page_id, # OPTIONAL for returning a specific Page
-        "lean": "true" 
+        "lean": "true",
+        'fields': ','.join(fields) if fields else None,  # OPTIONAL projection
     }
 
     # check headers for API KEY
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.get(
+    resp = send_cached_get(
+        resource='page',
         url=url, 
         headers=headers, 
-        params=params
+        params=params,
+        cache=cache,
+        refresh=refresh,
+        fields=fields
     )
 
-    # format response
-    resp = format_response(res)
-
     # return object as dict
     return resp
 
@@ -307,7 +478,8 @@ def api_delete_page(*args, **kwargs):
     headers = check_headers(api_key=api_key)
     
     # send the request
-    res = requests.delete(
+    res = send_request(
+        'DELETE',
         url=url, 
         headers=headers, 
     )
@@ -315,6 +487,9 @@ def api_delete_page(*args, **kwargs):
     # format response
     resp = format_response(res)
 
+    # invalidate cached listings
+    cache_invalidate('page')
+
     # return object as dict
     return resp
 
@@ -343,7 +518,8 @@ def api_scan_site(*args, **kwargs):
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.post(
+    res = send_request(
+        'POST',
         url=url, 
         headers=headers, 
         data=json.dumps(data)
@@ -352,6 +528,9 @@ def api_scan_site(*args, **kwargs):
     # format response
     resp = format_response(res)
 
+    # invalidate cached listings
+    cache_invalidate('page')
+
     # return object as dict
     return resp
 
@@ -380,7 +559,8 @@ def api_scan_page(*args, **kwargs):
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.post(
+    res = send_request(
+        'POST',
         url=url, 
         headers=headers, 
         data=json.dumps(data)
@@ -389,6 +569,9 @@ def api_scan_page(*args, **kwargs):
     # format response
     resp = format_response(res)
 
+    # invalidate cached listings
+    cache_invalidate('page')
+
     # return object as dict
     return resp
 
@@ -406,6 +589,7 @@ def api_get_scans(*args, **kwargs):
     page_id = kwargs.get('page_id')
     scan_id = kwargs.get('scan_id')
     api_key = kwargs.get('api_key')
+    fields = get_fields(kwargs.get('fields'))
 
     # setup configs
     url = f'{CURSION_API_BASE_URL}/scan'
@@ -413,21 +597,23 @@ def api_get_scans(*args, **kwargs):
     params = {
         'scan_id': scan_id,  # OPTIONAL for returning a specific Scan
         'page_id': page_id,
-        'lean': 'true'
+        'lean': 'true',
+        'fields': ','.join(fields) if fields else None,  # OPTIONAL projection
     }
 
     # check headers for API KEY
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.get(
+    res = send_request(
+        'GET',
         url=url, 
         headers=headers, 
         params=params
     )
 
     # format response
-    resp = format_response(res)
+    resp = format_response(res, fields=fields)
 
     # return object as dict
     return resp
@@ -462,7 +648,8 @@ def api_test_page(*args, **kwargs):
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.post(
+    res = send_request(
+        'POST',
         url=url, 
         headers=headers, 
         data=json.dumps(data)
@@ -488,6 +675,7 @@ def api_get_tests(*args, **kwargs):
     page_id = kwargs.get('page_id')
     test_id = kwargs.get('test_id')
     api_key = kwargs.get('api_key')
+    fields = get_fields(kwargs.get('fields'))
 
     # setup configs
     url = f'{CURSION_API_BASE_URL}/test'
@@ -495,21 +683,23 @@ def api_get_tests(*args, **kwargs):
     params = {
         'test_id': test_id, 
         'page_id': page_id,
-        'lean': 'true'
+        'lean': 'true',
+        'fields': ','.join(fields) if fields else None,  # OPTIONAL projection
     }
 
     # check headers for API KEY
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.get(
+    res = send_request(
+        'GET',
         url=url, 
         headers=headers, 
         params=params
     )
 
     # format response
-    resp = format_response(res)
+    resp = format_response(res, fields=fields)
 
     # return object as dict
     return resp
@@ -528,6 +718,9 @@ def api_get_cases(*args, **kwargs):
     site_id = kwargs.get('site_id')
     case_id = kwargs.get('case_id')
     api_key = kwargs.get('api_key')
+    fields = get_fields(kwargs.get('fields'))
+    cache = kwargs.get('cache', False)
+    refresh = kwargs.get('refresh', False)
 
     # setup configs
     url = f'{CURSION_API_BASE_URL}/case'
@@ -535,21 +728,23 @@ def api_get_cases(*args, **kwargs):
     params = {
         'case_id': case_id, 
         'site_id': site_id,
+        'fields': ','.join(fields) if fields else None,  # OPTIONAL projection
     }
 
     # check headers for API KEY
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.get(
+    resp = send_cached_get(
+        resource='case',
         url=url, 
         headers=headers, 
-        params=params
+        params=params,
+        cache=cache,
+        refresh=refresh,
+        fields=fields
     )
 
-    # format response
-    resp = format_response(res)
-
     # return object as dict
     return resp
 
@@ -567,6 +762,9 @@ def api_get_testcases(*args, **kwargs):
     site_id = kwargs.get('site_id')
     testcase_id = kwargs.get('testcase_id')
     api_key = kwargs.get('api_key')
+    fields = get_fields(kwargs.get('fields'))
+    cache = kwargs.get('cache', False)
+    refresh = kwargs.get('refresh', False)
 
     # setup configs
     url = f'{CURSION_API_BASE_URL}/testcase'
@@ -574,21 +772,23 @@ def api_get_testcases(*args, **kwargs):
     params = {
         'testcase_id': testcase_id,
         'site_id': site_id,
+        'fields': ','.join(fields) if fields else None,  # OPTIONAL projection
     }
 
     # check headers for API KEY
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.get(
+    resp = send_cached_get(
+        resource='testcase',
         url=url, 
         headers=headers, 
-        params=params
+        params=params,
+        cache=cache,
+        refresh=refresh,
+        fields=fields
     )
 
-    # format response
-    resp = format_response(res)
-
     # return object as dict
     return resp
 
@@ -621,7 +821,8 @@ def api_add_testcases(*args, **kwargs):
     headers = check_headers(api_key=api_key)
 
     # send the request
-    res = requests.post(
+    res = send_request(
+        'POST',
         url=url, 
         headers=headers,
         data=json.dumps(data)
@@ -630,50 +831,736 @@ def api_add_testcases(*args, **kwargs):
     # format response
     resp = format_response(res)
 
+    # invalidate cached listings
+    cache_invalidate('testcase')
+
     # return object as dict
     return resp
 
 
 
 
-def wait_for_completion(ids: list, obj: str) -> None:
+def iter_results(url: str, params: dict=None, api_key: str=None, fields: list=None):
+
+    """
+    This generator lazily yields every object in a paginated
+    listing - following the "next" links of each response 
+    while prefetching the following page in the background 
+    as the current one is consumed. Passing "fields" trims
+    every record down to them (see `api_get_scans`)
+    """
+
+    # check headers for API KEY
+    headers = check_headers(api_key=api_key)
+    fields = get_fields(fields)
+    if fields:
+        params = {**(params or {}), 'fields': ','.join(fields)}
+
+    def fetch(url: str, params: dict=None) -> dict:
+        # send the request
+        res = send_request(
+            'GET',
+            url=url, 
+            headers=headers, 
+            params=params
+        )
+        # decoding here - off the consuming thread
+        resp = format_response(res, fields=fields)
+        resp['data']
+        return resp
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch, url, params)
+        while future is not None:
+            resp = future.result()
+            if not resp['success']:
+                raise Exception(f'- Cursion API Error : {resp["data"]} -')
+
+            # prefetching the next page
+            data = resp['data']
+            next_url = data.get('next') if isinstance(data, dict) else None
+            future = executor.submit(fetch, next_url) if next_url else None
+
+            # yielding records from the current page
+            if isinstance(data, dict) and 'results' not in data:
+                yield data
+            else:
+                yield from get_results(data)
+
+
+
+
+def iter_sites(api_key: str=None, fields: list=None):
+
+    """
+    Lazily yields every `Site` in your account
+    """
+
+    yield from iter_results(
+        url=f'{CURSION_API_BASE_URL}/site',
+        api_key=api_key,
+        fields=fields
+    )
+
+
+
+
+def iter_pages(site_id: str, api_key: str=None, fields: list=None):
+
+    """
+    Lazily yields every `Page` associated with "site_id"
+    """
+
+    yield from iter_results(
+        url=f'{CURSION_API_BASE_URL}/page',
+        params={'site_id': site_id, 'lean': 'true'},
+        api_key=api_key,
+        fields=fields
+    )
+
+
+
+
+def iter_scans(page_id: str, api_key: str=None, fields: list=None):
+
+    """
+    Lazily yields every `Scan` associated with "page_id"
+    """
+
+    yield from iter_results(
+        url=f'{CURSION_API_BASE_URL}/scan',
+        params={'page_id': page_id, 'lean': 'true'},
+        api_key=api_key,
+        fields=fields
+    )
+
+
+
+
+def iter_tests(page_id: str, api_key: str=None, fields: list=None):
+
+    """
+    Lazily yields every `Test` associated with "page_id"
+    """
+
+    yield from iter_results(
+        url=f'{CURSION_API_BASE_URL}/test',
+        params={'page_id': page_id, 'lean': 'true'},
+        api_key=api_key,
+        fields=fields
+    )
+
+
+
+
+def iter_cases(site_id: str=None, api_key: str=None, fields: list=None):
+
+    """
+    Lazily yields every `Case` associated with "site_id"
+    """
+
+    yield from iter_results(
+        url=f'{CURSION_API_BASE_URL}/case',
+        params={'site_id': site_id},
+        api_key=api_key,
+        fields=fields
+    )
+
+
+
+
+def iter_testcases(site_id: str=None, api_key: str=None, fields: list=None):
+
+    """
+    Lazily yields every `Testcase` associated with "site_id"
+    """
+
+    yield from iter_results(
+        url=f'{CURSION_API_BASE_URL}/testcase',
+        params={'site_id': site_id},
+        api_key=api_key,
+        fields=fields
+    )
+
+
+
+
+def get_status(id: str, obj: str, api_key: str=None) -> dict:
+
+    """ 
+    This method retrieves the current state of a 
+    single `Scan`, `Test` or `Testcase` object - or an
+    empty dict when the API could not be reached (even
+    after retries), leaving the object pending. Only the
+    `STATUS_FIELDS` polling reads are kept.
+    """
+
+    fields = STATUS_FIELDS.get(obj)
+    try:
+        if obj == 'scan':
+            return api_get_scans(scan_id=id, page_id=None, api_key=api_key, fields=fields)['data']
+        if obj == 'test':
+            return api_get_tests(test_id=id, page_id=None, api_key=api_key, fields=fields)['data']
+        if obj == 'testcase':
+            return api_get_testcases(testcase_id=id, api_key=api_key, fields=fields)['data']
+    except (RequestException, ValueError):
+        return {}
+
+
+
+
+def get_results(data) -> list:
+
+    """ 
+    This method returns the list of objects held in
+    either a paginated or a plain list response
+    """
+
+    if isinstance(data, dict):
+        return data.get('results') or []
+    if isinstance(data, list):
+        return data
+    return []
+
+
+
+
+def get_listing(page_id: str, obj: str, api_key: str=None) -> list:
+
+    """ 
+    This method retrieves the latest `Scan` or `Test`
+    objects recorded for a single `Page`
+    """
+
+    fields = STATUS_FIELDS.get(obj)
+    try:
+        if obj == 'scan':
+            return get_results(api_get_scans(page_id=page_id, api_key=api_key, fields=fields)['data'])
+        if obj == 'test':
+            return get_results(api_get_tests(page_id=page_id, api_key=api_key, fields=fields)['data'])
+    except (RequestException, ValueError):
+        pass
+    return []
+
+
+
+
+def is_completed(data) -> bool:
+
+    """ 
+    This method checks whether a polled `Scan`, `Test` 
+    or `Testcase` has finished - tolerating error bodies
+    """
+
+    return isinstance(data, dict) and data.get('time_completed') is not None
+
+
+
+
+def resolve_statuses(
+        pending: list,
+        obj: str,
+        executor: ThreadPoolExecutor,
+        pages: dict=None,
+        site_id: str=None,
+        api_key: str=None
+    ) -> dict:
+
+    """ 
+    This method resolves the current state of every
+    pending id using as few requests as possible:
+        1. One site-level `Page` listing (via "latest_scan")
+        2. One `Scan` or `Test` listing per `Page` in "pages"
+        3. One GET per id that is still unresolved
+    """
+
+    resolved = {}
+    lookup = {str(id): id for id in pending}
+
+    # 1. site-level listing covers every "latest_scan"
+    if obj == 'scan' and site_id is not None:
+        try:
+            for page in iter_pages(site_id=site_id, api_key=api_key, fields=LATEST_SCAN_FIELDS):
+                scan = (page.get('info') or {}).get('latest_scan') or {}
+                if str(scan.get('id')) in lookup and 'time_completed' in scan:
+                    resolved[lookup[str(scan['id'])]] = scan
+        except Exception:
+            # falling through to the narrower listings
+            pass
+
+    # 2. page-level listings for the remaining ids
+    if pages is not None:
+        page_ids = list(dict.fromkeys(
+            str(pages[id]) for id in pending 
+            if id not in resolved and pages.get(id) is not None
+        ))
+        listings = executor.map(
+            lambda page_id: get_listing(page_id=page_id, obj=obj, api_key=api_key),
+            page_ids
+        )
+        for listing in listings:
+            for item in listing:
+                id = lookup.get(str(item.get('id')))
+                if id is not None and id not in resolved:
+                    resolved[id] = item
+
+    # 3. falling back to per-id GETs
+    remaining = [id for id in pending if id not in resolved]
+    statuses = executor.map(
+        lambda id: get_status(id=id, obj=obj, api_key=api_key), 
+        remaining
+    )
+    for id, data in zip(remaining, statuses):
+        resolved[id] = data
+
+    return resolved
+
+
+
+
+def wait_for_completion(
+        ids: list, 
+        obj: str,
+        concurrency: int=POLL_CONCURRENCY,
+        api_key: str=None,
+        pages: dict=None,
+        site_id: str=None,
+        max_wait_time: int=900,
+        executor: ThreadPoolExecutor=None
+    ) -> dict:
 
     """ 
     This method waits for either a set of `Scan` or `Test` objects
-    finish running - or timesout at max_wait_time (900s)
+    finish running - or timesout at "max_wait_time" (900s).
+    Rounds are spaced by a `PollScheduler` - starting fast
+    and backing off with jitter until the deadline.
+    Each round resolves every pending id in bulk - via the
+    `Page` listing for "site_id" and the per-page listings 
+    for the id -> page_id map in "pages" - and only GETs the 
+    ids those listings did not cover, in parallel (up to 
+    "concurrency" at once - or on the shared "executor"). 
+    Completed ids drop out of later rounds. Returns the 
+    completed objects by id. While tracing, the wait and 
+    each round are recorded as spans.
+    """
+
+    completions = {}
+    pending = list(dict.fromkeys(ids))
+    scheduler = PollScheduler(max_wait_time=max_wait_time)
+    ensure_pool_size(concurrency)
+    with span('wait', obj=obj, ids=len(pending)) as wait, \
+            get_executor(concurrency, executor) as pool:
+        rounds = 0
+        while len(pending) > 0:
+            # checking status of all pending objs
+            with span('poll_round', obj=obj, round=rounds, pending=len(pending)) as poll_round:
+                statuses = resolve_statuses(
+                    pending=pending, 
+                    obj=obj, 
+                    executor=pool,
+                    pages=pages,
+                    site_id=site_id,
+                    api_key=api_key
+                )
+                completed = 0
+                for id in list(pending):
+                    # alerting completion
+                    if is_completed(statuses.get(id)):
+                        rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' {obj} completed -> {id}')
+                        completions[id] = statuses[id]
+                        pending.remove(id)
+                        completed += 1
+                poll_round['completed'] = completed
+            rounds += 1
+
+            # waiting for next round or deadline
+            scheduler.observe(completed=completed)
+            if len(pending) > 0 and not scheduler.wait():
+                rprint(
+                    '[red bold]' + u'\u2718' + '[/red bold]' + 
+                    f' max wait time reached - {len(pending)} {obj}(s) still running'
+                )
+                break
+
+        wait.update(rounds=rounds, completed=len(completions), pending=len(pending))
+
+    return completions
+
+
+
+
+def print_test_result(test_id: str, score: float, threshold: int, site_id: str=None) -> bool:
+
+    """ 
+    This method prints the pass/fail line for a single
+    `Test` and returns whether it passed the "threshold"
+    """
+
+    emit(
+        'test_result', start=time.time(), duration=0, site_id=site_id,
+        test_id=test_id, score=score, passed=score is not None and score >= threshold
+    )
+
+    if score is None:
+        rprint(
+            ' [red bold]' + u'\u2718' + '[/red bold]' +
+            f' incomplete : https://app.cursion.dev/test/{test_id}'
+        )
+        return False
+
+    _score = str(round(score, 2))
+    if score >= threshold:
+        rprint(
+            ' [green bold]' + u'\u2714' + '[/green bold]' + 
+            f' passed {_score}% : https://app.cursion.dev/test/{test_id}'
+        )
+        return True
+
+    rprint(
+        ' [red bold]' + u'\u2718' + '[/red bold]' +
+        f' failed {_score}% : https://app.cursion.dev/test/{test_id}'
+    )
+    return False
+
+
+
+
+def create_object(send, api_key: str=None, **kwargs) -> tuple:
+
+    """ 
+    This method sends one create request ("send" - e.g.
+    `api_scan_page` or `api_test_page`) and returns the 
+    new object's (id, None) - or (None, error) when the
+    request failed, so that one failed POST only fails 
+    its own `Page`
+    """
+
+    try:
+        resp = send(api_key=api_key, **kwargs)
+    except RequestException as e:
+        return None, str(e) or type(e).__name__
+    if not resp['success']:
+        return None, resp['data']
+
+    return str(resp['data']['ids'][0]), None
+
+
+
+
+def print_create_error(stage: str, page_url: str, error) -> None:
+
+    """ 
+    This method reports a `Page` whose "stage" object
+    could not be created
+    """
+
+    rprint(
+        ' [red bold]' + u'\u2718' + '[/red bold]' +
+        f' failed at {stage} : {page_url} - {error}'
+    )
+
+
+
+
+def run_test_pipeline(
+        site: dict,
+        pages: list,
+        threshold: int=95,
+        max_wait_time: int=900,
+        concurrency: int=POLL_CONCURRENCY,
+        api_key: str=None,
+        executor: ThreadPoolExecutor=None,
+        checkpoint: RunCheckpoint=None,
+        results: dict=None
+    ) -> bool:
+
+    """ 
+    This method moves every `Page` through its own
+    pre_scan -> post_scan -> test pipeline. A `Page`'s
+    "post_scan" is created as soon as its "pre_scan" 
+    completes and its `Test` as soon as its "post_scan" 
+    completes - so no `Page` waits on any other. Results 
+    are printed per `Page` as they arrive. A `Page` whose
+    scan or `Test` can't be created fails on its own while
+    the others carry on. Each `Page`'s stage & ids are kept 
+    in "checkpoint" (if passed) and restored from it when 
+    resuming - failed `Pages` are retried then. "results", 
+    if passed, is filled with {page_id: passed} as `Tests` 
+    finish or `Pages` fail.
+    """
+
+    # tracking the current stage & ids for each `Page`
+    saved = checkpoint.get('pages', {}) if checkpoint is not None else {}
+    states = []
+    for page in pages:
+        state = {
+            'page': page,
+            'stage': 'pre_scan',
+            'pre_scan': str(page['info']['latest_scan']['id']),
+            'post_scan': None,
+            'test': None,
+        }
+        state.update(saved.get(str(page['id']), {}))
+        # finished `Pages` are re-polled for their score
+        if state['stage'] == 'done':
+            state['stage'] = 'test'
+        states.append(state)
+
+    def save(force: bool=True) -> None:
+        if checkpoint is None or not (force or checkpoint.due()):
+            return None
+        checkpoint.state['pages'] = {
+            str(state['page']['id']): {
+                key: state[key] for key in ('stage', 'pre_scan', 'post_scan', 'test')
+            } for state in states
+        }
+        checkpoint.save(force=force)
+
+    def is_active(state: dict) -> bool:
+        return state['stage'] != 'done' and state.get('error') is None
+
+    def create(state: dict, stage: str, send, **kwargs) -> None:
+        # recording a failed request on the `Page` alone
+        id, error = create_object(send, api_key=api_key, **kwargs)
+        if error is not None:
+            state['error'] = error
+            return None
+        state[stage] = id
+        state['stage'] = stage
+        state['created'] = time.monotonic()
+        return None
+
+    def advance(state: dict, data: dict) -> dict:
+        # creating the next object for a `Page`
+        page_id = str(state['page']['id'])
+        if state['stage'] == 'pre_scan':
+            create(state, 'post_scan', api_scan_page, page_id=page_id)
+        elif state['stage'] == 'post_scan':
+            create(
+                state, 'test', api_test_page,
+                page_id=page_id,
+                pre_scan=state['pre_scan'],
+                post_scan=state['post_scan']
+            )
+        elif state['stage'] == 'test':
+            state['score'] = data.get('score')
+            if state['score'] is None:
+                data = get_status(id=state['test'], obj='test', api_key=api_key)
+                state['score'] = data.get('score') if isinstance(data, dict) else None
+            state['stage'] = 'done'
+        return state
+
+    success = True
+    save()
+    scheduler = PollScheduler(max_wait_time=max_wait_time)
+    ensure_pool_size(concurrency)
+    print(f'\nrunning pipeline for {len(states)} pages...')
+    with get_executor(concurrency, executor) as pool:
+        rounds = 0
+        while any(is_active(state) for state in states):
+
+            # resolving all pending scans & tests in bulk
+            active = [state for state in states if is_active(state)]
+            with span('poll_round', obj='pipeline', round=rounds, pending=len(active)) as poll_round:
+                scans = {
+                    state[state['stage']]: str(state['page']['id']) 
+                    for state in active if state['stage'] != 'test'
+                }
+                tests = {
+                    state['test']: str(state['page']['id']) 
+                    for state in active if state['stage'] == 'test'
+                }
+                statuses = {}
+                if len(scans) > 0:
+                    statuses.update(resolve_statuses(
+                        pending=list(scans), obj='scan', executor=pool,
+                        pages=scans, site_id=str(site['id']), api_key=api_key
+                    ))
+                if len(tests) > 0:
+                    statuses.update(resolve_statuses(
+                        pending=list(tests), obj='test', executor=pool,
+                        pages=tests, api_key=api_key
+                    ))
+
+                # advancing every `Page` whose current object completed
+                done = [
+                    state for state in active 
+                    if is_completed(statuses.get(state[state['stage']]))
+                ]
+                # timing only objects this run created
+                durations = [
+                    time.monotonic() - state['created'] 
+                    for state in done if state.get('created') is not None
+                ]
+                advanced = pool.map(
+                    lambda state: (state['stage'], advance(state, statuses[state[state['stage']]])), 
+                    done
+                )
+                for stage, state in advanced:
+                    save(force=False)
+                    page_url = state['page']['page_url']
+                    if state.get('error') is not None:
+                        print_create_error(stage=stage, page_url=page_url, error=state['error'])
+                        if results is not None:
+                            results[str(state['page']['id'])] = False
+                        success = False
+                    elif stage == 'pre_scan':
+                        rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' pre_scan completed -> {page_url}')
+                    elif stage == 'post_scan':
+                        rprint(str(f'\ntesting page {page_url}\
+                        \n test_id    : {state['test']}\
+                        \n pre_scan   : {state['pre_scan']}\
+                        \n post_scan  : {state['post_scan']}'
+                        ))
+                    elif stage == 'test':
+                        passed = print_test_result(
+                            test_id=state['test'], 
+                            score=state['score'], 
+                            threshold=threshold,
+                            site_id=str(site['id'])
+                        )
+                        if results is not None:
+                            results[str(state['page']['id'])] = passed
+                        if not passed:
+                            success = False
+                poll_round['completed'] = len(done)
+            if len(done) > 0:
+                save()
+            rounds += 1
+
+            # waiting for next round or deadline
+            scheduler.observe(completed=len(done), durations=durations)
+            if any(is_active(state) for state in states) and not scheduler.wait():
+                for state in states:
+                    if is_active(state):
+                        rprint(
+                            ' [red bold]' + u'\u2718' + '[/red bold]' +
+                            f' timed out at {state['stage']} : {state['page']['page_url']}'
+                        )
+                success = False
+                break
+
+    # returning results
+    return success
+
+
+
+
+def select_changed_pages(
+        site_id: str,
+        pages: list,
+        full: bool=False,
+        concurrency: int=POLL_CONCURRENCY
+    ) -> tuple:
+
+    """ 
+    This method fingerprints every `Page` (see
+    `fingerprint.fetch_fingerprint`) and compares them 
+    to the `Site`'s stored index - returns the `Pages` 
+    that changed (all of them when "full") and the 
+    new {page_id: fingerprint} of those `Pages`
+    """
+
+    print(f'\nfingerprinting {len(pages)} pages...')
+    with span('phase', phase='fingerprint', site_id=site_id) as fields:
+        index = load_index(site_id)
+        by_url = fetch_fingerprints(
+            urls=[page['page_url'] for page in pages], 
+            concurrency=concurrency
+        )
+        changed = [
+            page for page in pages
+            if by_url.get(page['page_url']) is None
+            or index.get(str(page['id'])) != by_url[page['page_url']]
+        ]
+        fields.update({'total': len(pages), 'changed': len(changed)})
+
+    rprint(
+        '[green bold]' + u'\u2714' + '[/green bold]' + 
+        f' {len(changed)} of {len(pages)} pages changed' + 
+        (' - testing all' if full else '')
+    )
+    selected = pages if full else changed
+    fingerprints = {
+        str(page['id']): by_url.get(page['page_url']) for page in selected
+    }
+
+    return selected, fingerprints
+
+
+
+
+def print_budget_report(phase: str, progress: dict) -> None:
+
+    """ 
+    This method prints how far a run got before its
+    budget ran out - (completed, total) per phase
     """
 
-    max_wait_time = 900
-    wait_time = 0
-    completions = []
-    while (len(completions) != len(ids)) and wait_time < max_wait_time:
-        # sleeping for 10 seconds
-        time.sleep(10)
-        wait_time += 15
-        # checking status of obj
-        for id in ids:
-            if obj == 'scan':
-                time_complete = api_get_scans(scan_id=id, page_id=None)['data']['time_completed']
-            if obj == 'test':
-                time_complete = api_get_tests(test_id=id, page_id=None)['data']['time_completed']
-            if obj == 'testcase':
-                time_complete = api_get_testcases(testcase_id=id)['data']['time_completed']
-            
-            # alerting completion
-            if time_complete is not None and id not in completions:
-                rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' {obj} completed -> {id}')
-                completions.append(id)
+    rprint(
+        '\n[red bold]' + u'\u2718' + '[/red bold]' + 
+        f' budget exhausted during {phase} - partial report:'
+    )
+    for name, (completed, total) in progress.items():
+        print(f' {name:<13}: {completed}/{total} completed')
+    if phase not in progress:
+        print(f' {phase:<13}: did not finish')
+
 
-    return None
+
+
+def check_site_availability(
+        site_url: str,
+        probe_urls: list=None,
+        max_wait_time: int=900
+    ) -> bool:
+
+    """ 
+    This method waits for "site_url" (and any extra 
+    "probe_urls" - e.g. a health endpoint) to stop 
+    returning 5xx responses, using cheap HEAD probes
+    """
+
+    print(f'checking site availablity...')
+    with span('availability', site_url=site_url) as fields:
+        available = wait_for_urls(
+            urls=[site_url, *(probe_urls or [])],
+            max_wait_time=max_wait_time
+        )
+        fields['available'] = available
+    
+    # determine if timeout 
+    if not available:
+        rprint(
+            '[red bold]' + u'\u2718' + '[/red bold]' + 
+            ' max wait time reached - proceeding with caution...'
+        )
+    else:
+        rprint(
+            '[green bold]' + u'\u2714' + '[/green bold]' 
+            + ' site is available'
+        )
+
+    return available
 
 
 
 
 def api_test_site(
         site_id: str,
-        max_wait_time: int=120,
+        max_wait_time: int=900,
         threshold: int=95,
-        api_key: str=None
+        api_key: str=None,
+        concurrency: int=POLL_CONCURRENCY,
+        pipeline: bool=False,
+        executor: ThreadPoolExecutor=None,
+        probe_urls: list=None,
+        budget: RunBudget=None,
+        run_id: str=None,
+        resume: bool=False,
+        incremental: bool=False,
+        full: bool=False,
+        shard: tuple=None
     ):
     
     """ 
@@ -689,163 +1576,477 @@ def api_test_site(
         7. Check for all "post_scan" completion
         8. Create new `Test` for each `Page`
         9. Check for all `Test` completion
+    When "pipeline" is True, steps 5-9 run per `Page`
+    (see `run_test_pipeline`) instead of as site-wide phases.
+    Passing an "executor" runs all polling & test creation 
+    on that shared pool (see `api_test_sites`).
+    Passing a "budget" (seconds or a `RunBudget`) bounds 
+    the whole run - each waiting phase gets its share of 
+    what is left (at most "max_wait_time"), and running 
+    out prints a partial report & raises `BudgetExhausted`.
+    A phase that times out with objects still pending
+    raises `PhaseTimedOut` rather than moving on.
+    Passing a "run_id" checkpoints every id the run creates 
+    (see `RunCheckpoint`) - with "resume", that run's 
+    checkpoint is loaded and its phases continue polling 
+    the objects already created instead of creating new ones.
+    With "incremental", only `Pages` whose content changed
+    since they last passed (see `select_changed_pages`) are
+    scanned & tested - "full" still tests them all while 
+    refreshing the fingerprints. A "shard" (K, N) limits
+    the run to the K-th of N stable partitions of the
+    `Site`'s `Pages` (see `sharding.in_shard`).
     """
 
-    # 1. get the site
-    site = api_get_sites(site_id=site_id, api_key=api_key)['data']
+    # setup checkpoint
+    checkpoint = None
+    if run_id is not None and resume:
+        checkpoint = RunCheckpoint.load(run_id)
+        if checkpoint.get('site_id') != site_id:
+            raise ValueError(f'- run {run_id} is for site {checkpoint.get("site_id")} -')
+        pipeline = checkpoint.get('pipeline', pipeline)
+        shard = checkpoint.get('shard', shard)
+        incremental = incremental and checkpoint.get('pre_scan_pages') is None
+        print(f'resuming run {run_id} from {checkpoint.get("phase")}...')
+    elif run_id is not None:
+        prune_runs()
+        checkpoint = RunCheckpoint(run_id=run_id)
+        checkpoint.update(
+            site_id=site_id, pipeline=pipeline, shard=shard,
+            phase='pipeline' if pipeline else 'pre_scan'
+        )
+        print(f'run id : {run_id}')
+    state = checkpoint.state if checkpoint is not None else {}
 
-    # 2. Check for crawl completion
-    wait_time = 0
-    site_status = 500
-    print(f'checking site availablity...')
-    while str(site_status).startswith('5') and wait_time < max_wait_time:
-        # sleeping for 5 seconds
-        time.sleep(5)
-        wait_time += 5
-        # check site status
-        site_status = requests.get(url=site['site_url']).status_code
-    
-    # determine if timeout 
-    if wait_time >= max_wait_time:
-        rprint(
-            '[red bold]' + u'\u2718' + '[/red bold]' + 
-            ' max wait time reached - proceeding with caution...'
+    def finish(passed: bool) -> None:
+        # a passed run leaves nothing to resume - a failed
+        # one is kept so --resume can retry its failed `Pages`
+        if checkpoint is None:
+            return None
+        if passed:
+            checkpoint.delete()
+        else:
+            checkpoint.update(phase='done', passed=passed)
+
+    # setup budget
+    if budget is not None and not isinstance(budget, RunBudget):
+        budget = RunBudget(total=budget)
+    progress = {}
+
+    def exhaust(phase: str):
+        print_budget_report(phase=phase, progress=progress)
+        raise BudgetExhausted(phase=phase, progress=progress)
+
+    budgeted = set()
+
+    def phase_time(phase: str) -> float:
+        # the phase's share of the budget - if any is left
+        if budget is None:
+            return max_wait_time
+        if budget.exhausted():
+            exhaust(phase)
+        seconds = budget.allot(phase=phase, limit=max_wait_time)
+        if seconds < max_wait_time:
+            budgeted.add(phase)
+        return seconds
+
+    def wait_phase(phase: str, ids: list, **kwargs) -> dict:
+        # waiting out the phase's share - then, if it overran,
+        # as much of the rest as later phases can spare
+        started = time.monotonic()
+        completions = wait_for_completion(ids=ids, max_wait_time=phase_time(phase), **kwargs)
+        pending = [id for id in dict.fromkeys(ids) if id not in completions]
+        if len(pending) == 0 or phase not in budgeted:
+            return completions
+        spare = min(budget.spare(phase), max_wait_time - (time.monotonic() - started))
+        if spare > 0:
+            print(f'\n{phase} overran its share of the budget - waiting up to {spare:.0f}s more...')
+            completions.update(wait_for_completion(ids=pending, max_wait_time=spare, **kwargs))
+        return completions
+
+    timings = {}
+
+    def start_phase(phase: str) -> None:
+        timings[phase] = (time.time(), time.monotonic())
+
+    def end_phase(phase: str, completed: int, total: int) -> None:
+        # recording progress & a "phase" span
+        progress[phase] = (completed, total)
+        start, started = timings.pop(phase)
+        emit(
+            'phase', start=start, duration=time.monotonic() - started,
+            phase=phase, site_id=site_id, completed=completed, total=total
         )
-    else:
+
+    def check_pending(phase: str, completed: int, total: int) -> None:
+        # stopping - rather than building on unfinished objects
+        if completed >= total:
+            return None
+        if checkpoint is not None:
+            checkpoint.save()
+        if budget is not None and budget.spare(phase) <= 0:
+            exhaust(phase)
         rprint(
-            '[green bold]' + u'\u2714' + '[/green bold]' 
-            + ' site is available'
+            '\n[red bold]' + u'\u2718' + '[/red bold]' + 
+            f' timed out during {phase} - {total - completed} of {total} still pending'
+        )
+        if checkpoint is not None:
+            print(f' resume with : cursion test-site {site_id} --resume {checkpoint.run_id}')
+        raise PhaseTimedOut(
+            phase=phase, pending=total - completed, 
+            run_id=checkpoint.run_id if checkpoint is not None else None
         )
 
+    # 1. get the site
+    site = api_get_sites(site_id=site_id, api_key=api_key)['data']
+
+    # 2. Check for crawl completion
+    available = check_site_availability(
+        site_url=site['site_url'],
+        probe_urls=probe_urls,
+        max_wait_time=phase_time('availability')
+    )
+    progress['availability'] = (int(available), 1)
+
     # 3. Get all `Pages` for associated `Site` 
     print(f'\nretrieving pages...')
-    pages = api_get_pages(site_id=str(site['id']), api_key=api_key)['data']['results']
+    pages = list(iter_pages(site_id=str(site['id']), api_key=api_key, fields=PAGE_FIELDS))
     rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' retrieved pages')
 
+    # 3a. Keep only this shard's `Pages`
+    if shard is not None:
+        pages = [page for page in pages if in_shard(str(page['id']), shard)]
+        print(f'shard {shard[0]}/{shard[1]} : {len(pages)} pages')
+
+    # 3b. Skip `Pages` that did not change
+    fingerprints = state.get('fingerprints')
+    if incremental and fingerprints is None:
+        pages, fingerprints = select_changed_pages(
+            site_id=str(site['id']), pages=pages, 
+            full=full, concurrency=concurrency
+        )
+        if checkpoint is not None:
+            checkpoint.update(fingerprints=fingerprints)
+    elif fingerprints is not None:
+        pages = [page for page in pages if str(page['id']) in fingerprints]
+    emit('pages', start=time.time(), duration=0, site_id=site_id, count=len(pages))
+    subset = fingerprints is not None or shard is not None
+    if subset and len(pages) == 0:
+        rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' no pages to test')
+        finish(True)
+        return True
+    results = {}
+
+    # 4-9. Run each `Page` through its own pipeline
+    if pipeline:
+        with span('phase', phase='pipeline', site_id=site_id):
+            success = run_test_pipeline(
+                site=site,
+                pages=pages,
+                threshold=threshold,
+                max_wait_time=phase_time('pipeline'),
+                concurrency=concurrency,
+                api_key=api_key,
+                executor=executor,
+                checkpoint=checkpoint,
+                results=results
+            )
+        if fingerprints is not None:
+            record_fingerprints(site_id=str(site['id']), fingerprints=fingerprints, results=results)
+        if not success and budget is not None and budget.exhausted():
+            exhaust('pipeline')
+        check_pending('pipeline', completed=len(results), total=len(pages))
+        finish(success)
+        return success
+
     # 4. Get all "pre_scan" id's for each `Page`
-    pre_scan_ids = []
-    for page in pages:
-        # option 1. - get scan ids from `Page` object already in memory
-        pre_scan_id = str(page['info']['latest_scan']['id'])
-        pre_scan_ids.append(pre_scan_id)
+    pre_scan_pages = state.get('pre_scan_pages')
+    if pre_scan_pages is None:
+        pre_scan_pages = {}
+        for page in pages:
+            # option 1. - get scan ids from `Page` object already in memory
+            pre_scan_id = str(page['info']['latest_scan']['id'])
+            pre_scan_pages[pre_scan_id] = str(page['id'])
+        if checkpoint is not None:
+            checkpoint.update(pre_scan_pages=pre_scan_pages)
+    pre_scan_ids = list(pre_scan_pages)
 
     # 5. Check for all "pre_scan" completion
-    print(f'\nchecking pre_scans for each page...')
-    wait_for_completion(ids=pre_scan_ids, obj='scan')
-    
+    if state.get('post_scan_ids') is None:
+        start_phase('pre_scan')
+        print(f'\nchecking pre_scans for each page...')
+        completions = wait_phase(
+            'pre_scan', ids=pre_scan_ids, obj='scan', 
+            concurrency=concurrency, api_key=api_key,
+            pages=pre_scan_pages, site_id=str(site['id']),
+            executor=executor
+        )
+        end_phase('pre_scan', completed=len(completions), total=len(set(pre_scan_ids)))
+        check_pending('pre_scan', completed=len(completions), total=len(set(pre_scan_ids)))
+
     # 6. Create new "post_scans" for each `Page`
-    print(f'\ncreating post_scans for each page...')
-    post_scan_ids = api_scan_site(site_id=str(site['id']), api_key=api_key)['data']['ids']
-    rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' post_scans created')
-
-    # 7. Check for all "post_scan" completion
-    print(f'\nchecking post_scans for each page...')
-    wait_for_completion(ids=post_scan_ids, obj='scan')
-
-    # 8. Create new `Test` for each `Page`
-    pages = api_get_pages(site_id=str(site['id']), api_key=api_key)['data']['results']
-    test_ids = []
-    i = 0
-    for page in pages:
+    if budget is not None and budget.exhausted():
+        exhaust('post_scan')
+    post_scan_ids = state.get('post_scan_ids')
+    # `Pages` whose post_scan could not be created
+    failed_pages = dict(state.get('failed_pages') or {})
+    page_urls = {str(page['id']): page['page_url'] for page in pages}
+    if state.get('page_tests') is None:
+        start_phase('post_scan')
+        if post_scan_ids is None and subset:
+            print(f'\ncreating post_scans for {len(pre_scan_pages)} pages...')
+            ensure_pool_size(concurrency)
+            page_ids = list(pre_scan_pages.values())
+            post_scan_ids = []
+            with get_executor(concurrency, executor) as pool:
+                created = pool.map(
+                    lambda page_id: create_object(api_scan_page, api_key=api_key, page_id=page_id),
+                    page_ids
+                )
+                for page_id, (post_scan_id, error) in zip(page_ids, created):
+                    if error is not None:
+                        failed_pages[page_id] = str(error)
+                        print_create_error(stage='post_scan', page_url=page_urls.get(page_id), error=error)
+                    else:
+                        post_scan_ids.append(post_scan_id)
+            if checkpoint is not None:
+                checkpoint.update(post_scan_ids=post_scan_ids, failed_pages=failed_pages, phase='post_scan')
+            rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' post_scans created')
+        elif post_scan_ids is None:
+            print(f'\ncreating post_scans for each page...')
+            resp = api_scan_site(site_id=str(site['id']), api_key=api_key)
+            if not resp['success']:
+                rprint(resp)
+                return False
+            post_scan_ids = resp['data']['ids']
+            if checkpoint is not None:
+                checkpoint.update(post_scan_ids=post_scan_ids, phase='post_scan')
+            rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' post_scans created')
+
+        # 7. Check for all "post_scan" completion
+        print(f'\nchecking post_scans for each page...')
+        completions = wait_phase(
+            'post_scan', ids=post_scan_ids, obj='scan', 
+            concurrency=concurrency, api_key=api_key,
+            site_id=str(site['id']),
+            executor=executor
+        )
+        end_phase('post_scan', completed=len(completions), total=len(set(post_scan_ids)))
+        check_pending('post_scan', completed=len(completions), total=len(set(post_scan_ids)))
+
+    # 8. Create new `Test` for each `Page` - skipping
+    # those a resumed run already created one for
+    if budget is not None and budget.exhausted():
+        exhaust('test')
+    start_phase('test')
+    pages = list(iter_pages(site_id=str(site['id']), api_key=api_key, fields=PAGE_FIELDS))
+    page_pre_scans = {page_id: pre_scan_id for pre_scan_id, page_id in pre_scan_pages.items()}
+    if subset:
+        pages = [page for page in pages if str(page['id']) in page_pre_scans]
+    pages = [page for page in pages if str(page['id']) not in failed_pages]
+    page_tests = dict(state.get('page_tests') or {})
+    if checkpoint is not None:
+        checkpoint.update(page_tests=page_tests, phase='test')
+
+    def create_test(page: dict) -> tuple:
         # send the request
-        test_id = api_test_page(
+        return create_object(
+            api_test_page,
             page_id=str(page['id']),
-            pre_scan=str(pre_scan_ids[i]),
+            pre_scan=page_pre_scans.get(str(page['id'])),
             post_scan=str(page['info']['latest_scan']['id']),
             api_key=api_key
-        )['data']['ids'][0]
-        # record test_id
-        test_ids.append(test_id)
-        rprint(str(f'\ntesting page {page['page_url']}\
-            \n test_id    : {test_id}\
-            \n pre_scan   : {pre_scan_ids[i]}\
-            \n post_scan  : {page["info"]["latest_scan"]["id"]}'
-        ))
-        i += 1
+        )
+
+    # `Pages` whose `Test` could not be created - retried on resume
+    test_errors = {}
+    ensure_pool_size(concurrency)
+    untested = [page for page in pages if str(page['id']) not in page_tests]
+    try:
+        with get_executor(concurrency, executor) as pool:
+            for page, (test_id, error) in zip(untested, pool.map(create_test, untested)):
+                if error is not None:
+                    test_errors[str(page['id'])] = error
+                    print_create_error(stage='test', page_url=page['page_url'], error=error)
+                    continue
+                # record test_id
+                page_tests[str(page['id'])] = test_id
+                if checkpoint is not None:
+                    checkpoint.save(force=False)
+                rprint(str(f'\ntesting page {page['page_url']}\
+                    \n test_id    : {test_id}\
+                    \n pre_scan   : {page_pre_scans.get(str(page['id']))}\
+                    \n post_scan  : {page["info"]["latest_scan"]["id"]}'
+                ))
+    finally:
+        if checkpoint is not None:
+            checkpoint.save()
+    test_ids = list(page_tests.values())
+    test_pages = {test_id: page_id for page_id, test_id in page_tests.items()}
 
     # 9. Check for all `Test` completion
     print(f'\nchecking test completion for each page...')
-    wait_for_completion(ids=test_ids, obj='test')
+    completions = wait_phase(
+        'test', ids=test_ids, obj='test', 
+        concurrency=concurrency, api_key=api_key,
+        pages=test_pages,
+        executor=executor
+    )
+    end_phase('test', completed=len(completions), total=len(set(test_ids)))
+
+    # collecting scores - reusing those already polled
+    def get_score(test_id: str) -> float:
+        score = (completions.get(test_id) or {}).get('score')
+        if score is None:
+            data = get_status(id=test_id, obj='test', api_key=api_key)
+            score = data.get('score') if isinstance(data, dict) else None
+        return score
+
+    with get_executor(concurrency, executor) as pool:
+        scores = list(pool.map(get_score, test_ids))
 
     # checking scores
     success = True
     print('\nTest results:')
-    for test_id in test_ids:
-        score = api_get_tests(test_id=test_id, api_key=api_key)['data']['score']
-        _score = str(round(score, 2))
-        if score >= threshold:
+    for test_id, score in zip(test_ids, scores):
+        passed = print_test_result(test_id=test_id, score=score, threshold=threshold, site_id=site_id)
+        results[test_pages[test_id]] = passed
+        if not passed:
+            success = False
+    for page_id, error in {**failed_pages, **test_errors}.items():
+        rprint(
+            ' [red bold]' + u'\u2718' + '[/red bold]' + 
+            f' failed : {page_urls.get(page_id, page_id)} - {error}'
+        )
+        results[page_id] = False
+        success = False
+    if fingerprints is not None:
+        record_fingerprints(site_id=str(site['id']), fingerprints=fingerprints, results=results)
+
+    # reporting tests cut short by the budget
+    check_pending('test', completed=len(completions), total=len(set(test_ids)))
+
+    finish(success)
+
+    # returning results
+    return success
+
+
+
+
+def api_test_sites(
+        site_ids: list,
+        max_wait_time: int=900,
+        threshold: int=95,
+        api_key: str=None,
+        concurrency: int=POLL_CONCURRENCY,
+        sites_concurrency: int=10,
+        max_in_flight: int=None,
+        pipeline: bool=False,
+        probe_urls: list=None,
+        budget: float=None
+    ) -> list:
+
+    """ 
+    This method runs the `api_test_site` flow for many 
+    `Sites` at once. All `Sites` share the pooled session, 
+    one polling pool of "concurrency" threads and an 
+    optional process-wide cap of "max_in_flight" requests. 
+    Each `Site`'s output is printed as a block once it 
+    finishes, followed by a combined summary. A "budget"
+    bounds the whole run - shared by every `Site`.
+    Returns one result per `Site` in "site_ids" order.
+    """
+
+    def run(site_id: str) -> dict:
+        started = time.monotonic()
+        error = None
+        exhausted = False
+        with capture_thread_output() as buffer:
+            try:
+                passed = api_test_site(
+                    site_id=site_id,
+                    max_wait_time=max_wait_time,
+                    threshold=threshold,
+                    api_key=api_key,
+                    concurrency=concurrency,
+                    pipeline=pipeline,
+                    executor=poller,
+                    probe_urls=probe_urls,
+                    budget=run_budget
+                )
+            except BudgetExhausted as e:
+                passed = False
+                exhausted = True
+                error = str(e)
+            except Exception as e:
+                passed = False
+                error = str(e) or type(e).__name__
+        return {
+            'site_id': site_id,
+            'passed': bool(passed),
+            'error': error,
+            'exhausted': exhausted,
+            'seconds': round(time.monotonic() - started, 1),
+            'output': buffer.getvalue(),
+        }
+
+    # one budget for the whole run
+    run_budget = RunBudget(total=budget) if budget is not None else None
+
+    # capping requests across all `Sites`
+    set_max_in_flight(max_in_flight)
+    ensure_pool_size(max(concurrency, sites_concurrency))
+
+    results = {}
+    site_ids = list(dict.fromkeys(site_ids))
+    print(f'testing {len(site_ids)} sites...')
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as poller, \
+            ThreadPoolExecutor(max_workers=max(1, sites_concurrency)) as runner:
+        futures = [runner.submit(run, site_id) for site_id in site_ids]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['site_id']] = result
+            rprint(f'\n[bold]--- site {result["site_id"]} ({result["seconds"]}s) ---[/bold]')
+            print(result['output'], end='')
+
+    # printing combined summary
+    print('\nSites summary:')
+    for site_id in site_ids:
+        result = results[site_id]
+        if result['passed']:
             rprint(
                 ' [green bold]' + u'\u2714' + '[/green bold]' + 
-                f' passed {_score}% : https://app.cursion.dev/test/{test_id}'
+                f' passed : {site_id} ({result["seconds"]}s)'
             )
         else:
             rprint(
                 ' [red bold]' + u'\u2718' + '[/red bold]' +
-                f' failed {_score}% : https://app.cursion.dev/test/{test_id}'
+                f' failed : {site_id} ({result["seconds"]}s)' +
+                (f' - {result["error"]}' if result['error'] else '')
             )
-            success = False
 
     # returning results
-    return success
+    return [results[site_id] for site_id in site_ids]
 
 
 
 
-def api_testcase_site(
-        site_id: str,
-        case_id: str,
-        max_wait_time: int=120,
-        api_key: str=None,
-        updates: dict=None,
-    ):
-    
+def parse_updates(updates: list) -> list:
+
     """ 
-    This method will run a full `Testcase` for the `Site`
-    asocaited with the passed id's. 
-    Full flow:
-        1. Determine if testing full site or page
-        2. Wait for `Site` to be available
-        3. Adjust steps data (from **kwargs)
-        4. Initiate the `Testcase`
-        5. Check for `Testcase` completion
+    This method parses "step-<n>:<value>" step data into 
+    `Testcase` updates - returns None if any are malformed
     """
 
-    # 1. get the site
-    site = api_get_sites(site_id=site_id, api_key=api_key)['data']
-
-    # 2. Wait for `Site` to be available
-    wait_time = 0
-    site_status = 500
-    print(f'checking site availablity...')
-    while str(site_status).startswith('5') and wait_time < max_wait_time:
-        # sleeping for 5 seconds
-        time.sleep(5)
-        wait_time += 5
-        # check site status
-        site_status = requests.get(url=site['site_url']).status_code
-    
-    # determine if timeout 
-    if wait_time >= max_wait_time:
-        rprint(
-            '[red bold]' + u'\u2718' + '[/red bold]' + 
-            ' max wait time reached - proceeding with caution...'
-        )
-    else:
-        rprint(
-            '[green bold]' + u'\u2714' + '[/green bold]' 
-            + ' site is available'
-        )
-
-    # 3. Adjust steps data (from **kwargs)
-    print(f'\nadjusting step data...')
     _updates = []
-    for i in updates:
+    for i in (updates or []):
         if '-' not in i or ':' not in i:
             rprint(
                 '[red bold]' + u'\u2718' + '[/red bold]' + 
                 ' step data formatted incorrectly (step-0:value)'
             )
-            return
+            return None
 
         # parsing data from step
         _str = str(i).split(':')
@@ -858,28 +2059,23 @@ def api_testcase_site(
             'value': value
         })
 
-    # done parsing and updating
-    rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' step data updated')
+    return _updates
 
-    # 4. Create new `Testcase`
-    testcase_data = api_add_testcases(
-        case_id=case_id,
-        site_id=site_id,
-        updates=_updates
-    )
 
-    if not testcase_data['success']:
-        rprint(testcase_data)
-        return False
-    
-    # saving testcase_id
-    testcase_id = testcase_data['data']['id']
 
-    # 5. Check for `Testcase` completion
-    print(f'\nwaiting for Testcase completion...')
-    wait_for_completion(ids=[testcase_id], obj='testcase')
-    testcase = api_get_testcases(testcase_id=testcase_id, api_key=api_key)['data']
+
+def print_testcase_result(testcase: dict, testcase_id: str) -> bool:
+
+    """ 
+    This method prints the results of a completed 
+    `Testcase` and returns whether it passed
+    """
+
     passed = testcase['passed']
+    emit(
+        'testcase_result', start=time.time(), duration=0, 
+        testcase_id=testcase_id, passed=bool(passed)
+    )
 
     failed = []
     i = 1
@@ -903,6 +2099,76 @@ def api_testcase_site(
             f'\n failed steps : {[n for n in failed]}'
         )
 
+    return passed
+
+
+
+
+def api_testcase_site(
+        site_id: str,
+        case_id: str,
+        max_wait_time: int=900,
+        api_key: str=None,
+        updates: dict=None,
+        concurrency: int=POLL_CONCURRENCY,
+        probe_urls: list=None,
+    ):
+    
+    """ 
+    This method will run a full `Testcase` for the `Site`
+    asocaited with the passed id's. 
+    Full flow:
+        1. Determine if testing full site or page
+        2. Wait for `Site` to be available
+        3. Adjust steps data (from **kwargs)
+        4. Initiate the `Testcase`
+        5. Check for `Testcase` completion
+    """
+
+    # 1. get the site
+    site = api_get_sites(site_id=site_id, api_key=api_key)['data']
+
+    # 2. Wait for `Site` to be available
+    check_site_availability(
+        site_url=site['site_url'],
+        probe_urls=probe_urls,
+        max_wait_time=max_wait_time
+    )
+
+    # 3. Adjust steps data (from **kwargs)
+    print(f'\nadjusting step data...')
+    _updates = parse_updates(updates)
+    if _updates is None:
+        return
+
+    # done parsing and updating
+    rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' step data updated')
+
+    # 4. Create new `Testcase`
+    testcase_data = api_add_testcases(
+        case_id=case_id,
+        site_id=site_id,
+        updates=_updates
+    )
+
+    if not testcase_data['success']:
+        rprint(testcase_data)
+        return False
+    
+    # saving testcase_id
+    testcase_id = testcase_data['data']['id']
+
+    # 5. Check for `Testcase` completion
+    print(f'\nwaiting for Testcase completion...')
+    with span('phase', phase='testcase', site_id=site_id):
+        wait_for_completion(
+            ids=[testcase_id], obj='testcase', 
+            concurrency=concurrency, api_key=api_key,
+            max_wait_time=max_wait_time
+        )
+    testcase = api_get_testcases(testcase_id=testcase_id, api_key=api_key)['data']
+    passed = print_testcase_result(testcase=testcase, testcase_id=testcase_id)
+
     # returning results
     return passed
 
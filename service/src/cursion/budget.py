@@ -0,0 +1,95 @@
+import time
+
+# exit code used when a run's "--budget" runs out
+BUDGET_EXIT_CODE = 3
+
+# default share of a run's budget per phase
+PHASE_SHARES = {
+    'availability': 0.1,
+    'pre_scan': 0.2,
+    'post_scan': 0.3,
+    'test': 0.4,
+}
+
+# share of the total kept back for each later phase
+# when a phase overruns its own share
+RESERVE_SHARE = 0.05
+
+
+
+
+class BudgetExhausted(Exception):
+
+    """
+    Raised when a run's `RunBudget` runs out before its
+    last phase completes - "progress" holds the
+    (completed, total) count of each phase reached
+    """
+
+    def __init__(self, phase: str, progress: dict=None):
+        self.phase = phase
+        self.progress = progress or {}
+        super().__init__(f'- Cursion budget exhausted during {phase} -')
+
+
+
+
+class RunBudget:
+
+    """
+    End-to-end time budget of "total" seconds for a run,
+    split across its phases by "shares". Each phase gets
+    its share of whatever is left when it starts - so
+    time a phase did not use carries forward to the
+    phases after it. A share is a target, not a limit:
+    a phase that overruns it may go on into what is left
+    (see `spare`).
+    """
+
+    def __init__(self, total: float, shares: dict=None, reserve: float=RESERVE_SHARE):
+        self.total = total
+        self.shares = shares or PHASE_SHARES
+        self.reserve = reserve
+        self.started = time.monotonic()
+
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+    def remaining(self) -> float:
+        return max(0.0, self.total - self.elapsed())
+
+
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+
+    def allot(self, phase: str, limit: float=None) -> float:
+
+        """
+        Returns the seconds "phase" may use - its share of
+        the remaining budget, weighted against the phases
+        still to come, and at most "limit"
+        """
+
+        phases = list(self.shares)
+        later = phases[phases.index(phase):] if phase in phases else [phase]
+        weight = sum(self.shares.get(p, 0) for p in later)
+        seconds = self.remaining() * (self.shares.get(phase, 1) / weight if weight else 1)
+
+        return seconds if limit is None else min(limit, seconds)
+
+
+    def spare(self, phase: str) -> float:
+
+        """
+        Returns the seconds "phase" may go on for once its
+        share is used up - what is left, minus a "reserve"
+        of the total for each phase after it
+        """
+
+        phases = list(self.shares)
+        later = phases[phases.index(phase) + 1:] if phase in phases else []
+
+        return max(0.0, self.remaining() - len(later) * self.reserve * self.total)
@@ -0,0 +1,108 @@
+import hashlib, json, os, threading, time
+from pathlib import Path
+from .config import CACHE_MAX_ENTRIES
+
+cache_dir = Path(str(Path.home()) + '/cursion/cache')
+
+# seconds each resource stays fresh
+CACHE_TTLS = {
+    'site': 3600,
+    'case': 3600,
+    'page': 300,
+    'testcase': 60,
+}
+
+
+
+
+def cache_key(resource: str, url: str, params: dict=None, token: str=None) -> str:
+
+    """
+    Builds the cache file name for a GET - keyed by
+    endpoint, params and API key
+    """
+
+    params = {k: v for k, v in (params or {}).items() if v is not None}
+    raw = json.dumps([url, sorted(params.items()), token], default=str)
+    digest = hashlib.sha256(raw.encode()).hexdigest()
+
+    return f'{resource}-{digest}.json'
+
+
+
+
+def cache_get(resource: str, url: str, params: dict=None, token: str=None) -> dict:
+
+    """
+    Returns the cached response for a GET - or None
+    if missing or older than the resource's TTL
+    """
+
+    path = cache_dir / cache_key(resource, url, params, token)
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # checking freshness
+    if time.time() - entry['time'] > CACHE_TTLS.get(resource, 0):
+        path.unlink(missing_ok=True)
+        return None
+
+    # marking as recently used
+    os.utime(path)
+
+    return entry['response']
+
+
+
+
+def cache_put(resource: str, url: str, params: dict=None, token: str=None, response: dict=None) -> None:
+
+    """
+    Stores a successful response for a GET and evicts
+    the least recently used entries past CACHE_MAX_ENTRIES
+    """
+
+    if response is None or not response.get('success'):
+        return None
+
+    # writing atomically
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / cache_key(resource, url, params, token)
+    tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'time': time.time(), 'response': dict(response)}, f)
+    os.replace(tmp, path)
+
+    # evicting least recently used
+    def last_used(path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return 0.0
+
+    entries = sorted(cache_dir.glob('*.json'), key=last_used)
+    for stale in entries[:max(0, len(entries) - CACHE_MAX_ENTRIES)]:
+        stale.unlink(missing_ok=True)
+
+    return None
+
+
+
+
+def cache_invalidate(*resources: str) -> None:
+
+    """
+    Drops every cached entry for the passed resources
+    """
+
+    if not cache_dir.exists():
+        return None
+
+    for resource in resources:
+        for path in cache_dir.glob(f'{resource}-*.json'):
+            path.unlink(missing_ok=True)
+
+    return None
@@ -0,0 +1,24 @@
+import os
+from pathlib import Path
+
+env_dir = Path(str(Path.home()) + '/cursion')
+env_file = Path(str(Path.home()) + '/cursion/.env')
+
+# loading $HOME/cursion/.env once per process -
+# python-dotenv is only imported when the file exists
+if env_file.exists():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=env_file)
+
+# import env vars
+API_ROOT = f'{os.getenv('API_ROOT') if os.getenv('API_ROOT') is not None else 'https://api.cursion.dev'}'
+API_KEY = f'Token {os.getenv('API_KEY')}'
+POOL_SIZE = int(os.getenv('POOL_SIZE') if os.getenv('POOL_SIZE') is not None else 20)
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY') if os.getenv('POLL_CONCURRENCY') is not None else 10)
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES') if os.getenv('CACHE_MAX_ENTRIES') is not None else 500)
+MAX_RETRIES = int(os.getenv('MAX_RETRIES') if os.getenv('MAX_RETRIES') is not None else 4)
+CIRCUIT_THRESHOLD = int(os.getenv('CIRCUIT_THRESHOLD') if os.getenv('CIRCUIT_THRESHOLD') is not None else 10)
+CIRCUIT_COOLDOWN = int(os.getenv('CIRCUIT_COOLDOWN') if os.getenv('CIRCUIT_COOLDOWN') is not None else 30)
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT') if os.getenv('CONNECT_TIMEOUT') is not None else 3.05)
+READ_TIMEOUT = float(os.getenv('READ_TIMEOUT') if os.getenv('READ_TIMEOUT') is not None else 30)
+ADD_PAGES_CHUNK_SIZE = int(os.getenv('ADD_PAGES_CHUNK_SIZE') if os.getenv('ADD_PAGES_CHUNK_SIZE') is not None else 100)
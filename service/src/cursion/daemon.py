@@ -0,0 +1,358 @@
+import ctypes, io, json, os, socket, sys, threading
+from pathlib import Path
+
+# where `cursion serve` listens - override with CURSION_SOCKET
+SOCKET_PATH = os.getenv('CURSION_SOCKET') or str(Path.home() / 'cursion' / 'cursion.sock')
+
+# commands & options always run in-process - they change
+# local config, hold the terminal or set process-wide state
+LOCAL_COMMANDS = ('serve', 'config', 'mock-server')
+LOCAL_OPTIONS = ('--trace', '--metrics-file', '--install-completion', '--show-completion')
+
+# env vars the daemon read at startup - a client with
+# different values runs in-process instead
+FORWARDED_ENV = ('API_ROOT', 'API_KEY')
+
+# config file the daemon read at startup - likewise, a
+# client seeing a different one (e.g. after `cursion
+# config`) runs in-process instead
+ENV_FILE = Path.home() / 'cursion' / '.env'
+
+
+
+
+def is_forwardable(argv: list) -> bool:
+
+    """
+    Returns whether "argv" may run in the daemon - not
+    when it names a local command or option, or reads
+    stdin ("-")
+    """
+
+    for arg in argv:
+        if arg in LOCAL_COMMANDS or arg == '-':
+            return False
+        if arg.split('=')[0] in LOCAL_OPTIONS:
+            return False
+
+    return True
+
+
+
+
+def config_stamp(path: Path=ENV_FILE) -> list:
+
+    """
+    Returns [mtime_ns, size] of the config file "path" -
+    None when there is none
+    """
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+
+
+def forward(argv: list, socket_path: str=SOCKET_PATH) -> int:
+
+    """
+    Runs "argv" in the `cursion serve` daemon - streaming
+    its stdout & stderr here - and returns its exit code.
+    Returns None when the command has to run in-process:
+    no daemon, a stale socket, a busy daemon or a
+    mismatched environment or config file.
+    """
+
+    if not is_forwardable(argv) or not os.path.exists(socket_path):
+        return None
+
+    try:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(socket_path)
+    except OSError:
+        return None
+
+    request = {
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': {name: os.environ.get(name) for name in FORWARDED_ENV},
+        'config': config_stamp(),
+        'tty': sys.stdout.isatty(),
+    }
+    with conn, conn.makefile('rwb') as stream:
+        stream.write(json.dumps(request).encode() + b'\n')
+        stream.flush()
+        for line in stream:
+            frame = json.loads(line)
+            if 'out' in frame:
+                sys.stdout.write(frame['out'])
+                sys.stdout.flush()
+            elif 'err' in frame:
+                sys.stderr.write(frame['err'])
+                sys.stderr.flush()
+            elif 'exit' in frame:
+                return frame['exit']
+            elif 'fallback' in frame:
+                return None
+
+    # the daemon went away mid-command
+    sys.stderr.write('- cursion daemon closed the connection -\n')
+    return 1
+
+
+
+
+class SocketStream(io.TextIOBase):
+
+    """
+    Text stream that sends every write to the client as
+    an {"out" | "err": text} frame - write errors are
+    dropped, since a client that hung up is caught (and
+    its command stopped) by `ClientWatcher`
+    """
+
+    def __init__(self, stream, key: str, lock: threading.Lock, tty: bool=False):
+        self.stream = stream
+        self.key = key
+        self.lock = lock
+        self.tty = tty
+
+
+    def write(self, text: str) -> int:
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', errors='replace')
+        if text:
+            send(self.stream, self.lock, {self.key: text})
+        return len(text)
+
+
+    def isatty(self) -> bool:
+        return self.tty
+
+
+    @property
+    def encoding(self) -> str:
+        return 'utf-8'
+
+
+
+
+def send(stream, lock: threading.Lock, frame: dict) -> None:
+    try:
+        with lock:
+            stream.write(json.dumps(frame).encode() + b'\n')
+            stream.flush()
+    except OSError:
+        pass
+
+    return None
+
+
+
+
+class ClientWatcher(threading.Thread):
+
+    """
+    Waits for the client of a running command to hang up -
+    it sends nothing after its request, so EOF on "conn"
+    means it is gone. The command is then stopped: every
+    later API request is cancelled and `RequestsCancelled`
+    is raised in the command's thread (once any sleep it
+    is in returns).
+    """
+
+    def __init__(self, conn: socket.socket):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.target = threading.get_ident()
+        self.lock = threading.Lock()
+        self.finished = False
+
+
+    def run(self) -> None:
+        from .transport import RequestsCancelled, cancel_requests
+
+        try:
+            data = self.conn.recv(1)
+        except OSError:
+            data = b''
+        if len(data) > 0:
+            return None
+
+        with self.lock:
+            if self.finished:
+                return None
+            cancel_requests()
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(self.target), ctypes.py_object(RequestsCancelled)
+            )
+
+        return None
+
+
+    def stop(self) -> None:
+
+        """
+        Called from the command's thread once it is done -
+        clears an interrupt that was not raised yet & wakes
+        `run` up
+        """
+
+        with self.lock:
+            self.finished = True
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.target), None)
+        try:
+            self.conn.shutdown(socket.SHUT_RD)
+        except OSError:
+            pass
+
+        return None
+
+
+
+
+def run_command(app, request: dict, stream, conn: socket.socket=None) -> int:
+
+    """
+    Runs one client's command on the typer "app" - in its
+    working directory, with its output sent back over
+    "stream" - stopping it if the client hangs up "conn".
+    Must be called with the daemon's run lock held, since
+    it swaps process-wide state.
+    """
+
+    from .transport import RequestsCancelled, cancel_requests, reset_stats, set_max_in_flight
+
+    lock = threading.Lock()
+    stdout, stderr, cwd = sys.stdout, sys.stderr, os.getcwd()
+    sys.stdout = SocketStream(stream, 'out', lock, tty=request.get('tty', False))
+    sys.stderr = SocketStream(stream, 'err', lock)
+    reset_stats()
+    set_max_in_flight(None)
+    cancel_requests(False)
+    watcher = ClientWatcher(conn) if conn is not None else None
+    try:
+        try:
+            os.chdir(request['cwd'])
+            if watcher is not None:
+                watcher.start()
+            app(args=request['argv'], prog_name='cursion')
+            code = 0
+        finally:
+            if watcher is not None:
+                watcher.stop()
+    except RequestsCancelled:
+        # the client hung up - nobody to report to
+        code = 1
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if isinstance(e.code, str):
+            sys.stderr.write(e.code + '\n')
+    except Exception as e:
+        sys.stderr.write(f'{type(e).__name__}: {e}\n')
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stdout, sys.stderr = stdout, stderr
+        cancel_requests(False)
+        os.chdir(cwd)
+
+    return code
+
+
+
+
+def serve(app, socket_path: str=SOCKET_PATH) -> None:
+
+    """
+    Serves commands for `forward` on a Unix socket until
+    interrupted - one at a time, so the warm session,
+    connection pool & caches are reused between them.
+    A client arriving while a command runs is told to
+    run in-process instead of queueing.
+    """
+
+    import signal, socketserver
+
+    run_lock = threading.Lock()
+    environ = {name: os.environ.get(name) for name in FORWARDED_ENV}
+    stamp = config_stamp()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline() or b'{}')
+            lock = threading.Lock()
+
+            # checking the client can run here
+            mismatched = [
+                name for name, value in (request.get('env') or {}).items()
+                if value is not None and value != environ.get(name)
+            ]
+            if 'argv' not in request or len(mismatched) > 0:
+                return send(self.wfile, lock, {'fallback': 'environment'})
+            if request.get('config') != stamp:
+                return send(self.wfile, lock, {'fallback': 'config'})
+            if not run_lock.acquire(blocking=False):
+                return send(self.wfile, lock, {'fallback': 'busy'})
+
+            try:
+                code = run_command(app, request, self.wfile, conn=self.connection)
+            finally:
+                run_lock.release()
+            send(self.wfile, lock, {'exit': code})
+
+    # clearing a stale socket - refusing to replace a live one
+    if os.path.exists(socket_path):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(socket_path)
+            raise RuntimeError(f'- cursion daemon already running on {socket_path} -')
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+
+    Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+
+    # creating the socket owner-only from the start
+    umask = os.umask(0o077)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(umask)
+    server.daemon_threads = True
+    print(f'cursion daemon listening on {socket_path}')
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+    return None
+
+
+
+
+def main() -> None:
+
+    """
+    Console entry point - forwards to a running daemon
+    before importing anything heavy, else runs in-process
+    """
+
+    code = forward(sys.argv[1:])
+    if code is not None:
+        sys.exit(code)
+
+    from .root import app
+    app()
@@ -0,0 +1,134 @@
+import hashlib, json, os, requests
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from .transport import send_request
+from .probe import PROBE_TIMEOUT
+
+fingerprints_dir = Path(str(Path.home()) + '/cursion/fingerprints')
+
+# bytes read at a time when hashing a body
+HASH_CHUNK_SIZE = 65536
+
+
+
+
+def fetch_fingerprint(url: str, timeout: tuple=PROBE_TIMEOUT) -> str:
+
+    """
+    Returns a cheap fingerprint of the content at "url" -
+    its `ETag`, else its `Last-Modified` (from a HEAD),
+    else a sha256 of its body streamed in chunks. Returns
+    None if the page could not be fetched - callers treat
+    that as changed. Never retried, like `probe_url`.
+    """
+
+    try:
+        res = send_request(
+            'HEAD',
+            url=url,
+            timeout=timeout,
+            allow_redirects=True,
+            retries=0,
+            circuit=False
+        )
+        res.close()
+        if res.status_code < 400:
+            if res.headers.get('ETag'):
+                return f'etag:{res.headers["ETag"]}'
+            if res.headers.get('Last-Modified'):
+                return f'modified:{res.headers["Last-Modified"]}'
+
+        # falling back to hashing the body
+        res = send_request(
+            'GET',
+            url=url,
+            timeout=timeout,
+            allow_redirects=True,
+            stream=True,
+            retries=0,
+            circuit=False
+        )
+        with res:
+            if res.status_code >= 400:
+                return None
+            digest = hashlib.sha256()
+            for chunk in res.iter_content(chunk_size=HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        return f'sha256:{digest.hexdigest()}'
+
+    except requests.RequestException:
+        return None
+
+
+
+
+def fetch_fingerprints(urls: list, concurrency: int=10, timeout: tuple=PROBE_TIMEOUT) -> dict:
+
+    """
+    Fingerprints every url at once (up to "concurrency"
+    in parallel) - returns {url: fingerprint}
+    """
+
+    urls = list(dict.fromkeys(urls))
+    if len(urls) == 0:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(urls), concurrency))) as executor:
+        fingerprints = executor.map(lambda url: fetch_fingerprint(url=url, timeout=timeout), urls)
+        return dict(zip(urls, fingerprints))
+
+
+
+
+def load_index(site_id: str) -> dict:
+
+    """
+    Returns the stored {page_id: fingerprint} index of
+    "site_id" - empty if there is none yet
+    """
+
+    try:
+        with open(fingerprints_dir / f'{site_id}.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+
+
+def save_index(site_id: str, index: dict) -> None:
+
+    """
+    Writes the {page_id: fingerprint} index of "site_id"
+    atomically
+    """
+
+    fingerprints_dir.mkdir(parents=True, exist_ok=True)
+    path = fingerprints_dir / f'{site_id}.json'
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+    return None
+
+
+
+
+def record_fingerprints(site_id: str, fingerprints: dict, results: dict) -> None:
+
+    """
+    Stores the fingerprint of each `Page` in "results"
+    ({page_id: passed}) that passed - and drops those
+    that failed, so they are tested again next run
+    """
+
+    index = load_index(site_id)
+    for page_id, passed in results.items():
+        if passed and fingerprints.get(page_id) is not None:
+            index[page_id] = fingerprints[page_id]
+        else:
+            index.pop(page_id, None)
+    save_index(site_id, index)
+
+    return None
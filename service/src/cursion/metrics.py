@@ -0,0 +1,194 @@
+import os, tempfile, threading, time
+from .tracing import add_listener
+
+# histogram buckets - seconds per request & test scores
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SCORE_BUCKETS = (50, 60, 70, 80, 90, 95, 99, 100)
+
+
+
+
+class Histogram:
+
+    """
+    Cumulative histogram over fixed "buckets"
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value: float) -> None:
+        for i, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+
+
+class RunMetrics:
+
+    """
+    Aggregates the spans of one CLI run (see `tracing`)
+    into metrics - phase durations, requests & latency
+    per endpoint, polling rounds, retries, page counts
+    and test scores
+    """
+
+    def __init__(self, command: str=None):
+        self.command = command
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.retries = {}
+        self.phases = {}
+        self.poll_rounds = {}
+        self.pages = 0
+        self.results = {}
+        self.scores = Histogram(SCORE_BUCKETS)
+
+
+    def observe(self, span: dict) -> None:
+
+        """
+        Listener for `tracing.add_listener` - folds one
+        span into the run's metrics
+        """
+
+        kind = span['kind']
+        seconds = span['duration_ms'] / 1000
+        with self.lock:
+            if kind == 'http':
+                key = (span['endpoint'], span['method'])
+                status = str(span.get('status', span.get('error')))
+                self.requests[(*key, status)] = self.requests.get((*key, status), 0) + 1
+                self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+                self.retries[key] = self.retries.get(key, 0) + span.get('retries', 0)
+            elif kind in ('phase', 'availability'):
+                phase = span.get('phase', kind)
+                self.phases[phase] = self.phases.get(phase, 0) + seconds
+            elif kind == 'poll_round':
+                self.poll_rounds[span['obj']] = self.poll_rounds.get(span['obj'], 0) + 1
+            elif kind == 'pages':
+                self.pages += span['count']
+            elif kind in ('test_result', 'testcase_result'):
+                obj = kind.split('_')[0]
+                result = 'passed' if span['passed'] else 'failed'
+                if obj == 'test' and span['score'] is None:
+                    result = 'incomplete'
+                self.results[(obj, result)] = self.results.get((obj, result), 0) + 1
+                if span.get('score') is not None:
+                    self.scores.observe(span['score'])
+
+
+    def render(self) -> str:
+
+        """
+        Returns the run's metrics in the Prometheus text 
+        format read by node-exporter's textfile collector
+        (families without samples are left out)
+        """
+
+        lines = []
+        header = []
+
+        def family(name: str, type: str, help: str) -> None:
+            header[:] = [f'# HELP {name} {help}', f'# TYPE {name} {type}']
+
+        def sample(name: str, value: float, **labels) -> None:
+            lines.extend(header)
+            header.clear()
+            if labels:
+                _labels = ','.join(f'{k}="{escape(v)}"' for k, v in labels.items())
+                lines.append(f'{name}{{{_labels}}} {value}')
+            else:
+                lines.append(f'{name} {value}')
+
+        def histogram(name: str, histogram: Histogram, **labels) -> None:
+            for bucket, count in zip(histogram.buckets, histogram.counts):
+                sample(f'{name}_bucket', count, **labels, le=str(bucket))
+            sample(f'{name}_bucket', histogram.count, **labels, le='+Inf')
+            sample(f'{name}_sum', round(histogram.sum, 6), **labels)
+            sample(f'{name}_count', histogram.count, **labels)
+
+        command = {'command': self.command} if self.command else {}
+        with self.lock:
+            family('cursion_run_start_seconds', 'gauge', 'Unix time the run started')
+            sample('cursion_run_start_seconds', round(self.started, 3), **command)
+            family('cursion_run_duration_seconds', 'gauge', 'Wall-clock duration of the run')
+            sample('cursion_run_duration_seconds', round(time.time() - self.started, 3), **command)
+
+            family('cursion_phase_duration_seconds', 'gauge', 'Seconds spent in each phase of the run')
+            for phase, seconds in self.phases.items():
+                sample('cursion_phase_duration_seconds', round(seconds, 3), phase=phase)
+
+            family('cursion_requests_total', 'counter', 'API requests sent, by endpoint, method & final status')
+            for (endpoint, method, status), count in self.requests.items():
+                sample('cursion_requests_total', count, endpoint=endpoint, method=method, status=status)
+
+            family('cursion_request_retries_total', 'counter', 'Retries sent, by endpoint & method')
+            for (endpoint, method), count in self.retries.items():
+                sample('cursion_request_retries_total', count, endpoint=endpoint, method=method)
+
+            family('cursion_request_duration_seconds', 'histogram', 'API request latency incl. retries')
+            for (endpoint, method), _histogram in self.latency.items():
+                histogram('cursion_request_duration_seconds', _histogram, endpoint=endpoint, method=method)
+
+            family('cursion_poll_rounds_total', 'counter', 'Polling rounds, by polled object')
+            for obj, count in self.poll_rounds.items():
+                sample('cursion_poll_rounds_total', count, obj=obj)
+
+            family('cursion_pages', 'gauge', 'Pages tested')
+            sample('cursion_pages', self.pages)
+
+            family('cursion_results_total', 'counter', 'Test & Testcase results, by outcome')
+            for (obj, result), count in self.results.items():
+                sample('cursion_results_total', count, obj=obj, result=result)
+
+            if self.scores.count > 0:
+                family('cursion_test_score', 'histogram', 'Test scores')
+                histogram('cursion_test_score', self.scores)
+
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+    def write(self, path: str) -> None:
+
+        """
+        Writes the metrics to "path" atomically, so a
+        textfile collector never reads a partial file
+        """
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.cursion-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+
+
+def escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+
+
+def enable_metrics(command: str=None) -> RunMetrics:
+
+    """
+    Starts aggregating every span of this run into a
+    `RunMetrics` & returns it
+    """
+
+    metrics = RunMetrics(command=command)
+    add_listener(metrics.observe)
+
+    return metrics
@@ -0,0 +1,552 @@
+import json, random, threading, time, uuid
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+from .response import get_fields, project
+
+
+
+
+class MockState:
+
+    """
+    In-memory store behind the mock Cursion API. Objects
+    complete "delay" seconds (+/- "delay_jitter") after
+    they are created.
+    """
+
+    def __init__(
+            self,
+            delay: float=5,
+            delay_jitter: float=0,
+            failure_rate: float=0,
+            latency: float=0,
+            page_size: int=50,
+            score: float=98,
+            seed: int=None,
+        ):
+        self.delay = delay
+        self.delay_jitter = delay_jitter
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.page_size = page_size
+        self.score = score
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sites = {}
+        self.pages = {}
+        self.scans = {}
+        self.tests = {}
+        self.cases = {}
+        self.testcases = {}
+        self.revisions = {}
+        self.scripted = {}
+        self.stats = {'connections': 0, 'requests': 0, 'failures': 0, 'bytes_sent': 0, 'routes': {}}
+        self.root = ''
+        self.default_site = None
+        self.default_case = None
+
+
+    def seed(self, pages: int=5) -> None:
+
+        """
+        Seeds a default `Site` with "pages" `Pages` & one `Case`
+        """
+
+        self.default_site = self.add_site(page_count=pages)
+        self.default_case = self.add_case(site_id=self.default_site['id'])
+
+
+    def fail_next(self, route: str, *statuses: int) -> None:
+
+        """
+        Fails the next requests to "route" (e.g. "POST
+        /v1/ops/test") with "statuses" - one each, in order
+        """
+
+        with self.lock:
+            self.scripted.setdefault(route, []).extend(statuses)
+
+
+    def now(self) -> float:
+        return time.time()
+
+
+    def timestamp(self, at: float) -> str:
+        return datetime.fromtimestamp(at, tz=timezone.utc).isoformat()
+
+
+    def completes_at(self) -> float:
+        jitter = self.random.uniform(-self.delay_jitter, self.delay_jitter)
+        return self.now() + max(0.0, self.delay + jitter)
+
+
+    def add_site(self, site_url: str=None, page_urls: list=None, page_count: int=0) -> dict:
+        site_id = str(uuid.uuid4())
+        site = {
+            'id': site_id,
+            'site_url': site_url or f'{self.root}/sites/{site_id}',
+            'time_created': self.timestamp(self.now()),
+        }
+        self.sites[site_id] = site
+        urls = page_urls or [
+            f'{site["site_url"]}/page-{n}' for n in range(page_count)
+        ]
+        for url in urls:
+            self.add_page(site_id=site_id, page_url=url)
+        return site
+
+
+    def add_page(self, site_id: str, page_url: str) -> dict:
+        page_id = str(uuid.uuid4())
+        self.pages[page_id] = {
+            'id': page_id,
+            'site': site_id,
+            'page_url': page_url,
+            'time_created': self.timestamp(self.now()),
+        }
+        self.add_scan(page_id=page_id)
+        return self.pages[page_id]
+
+
+    def add_scan(self, page_id: str) -> str:
+        scan_id = str(uuid.uuid4())
+        self.scans[scan_id] = {
+            'id': scan_id,
+            'page': page_id,
+            'created': self.now(),
+            'completes': self.completes_at(),
+        }
+        self.pages[page_id]['latest_scan'] = scan_id
+        return scan_id
+
+
+    def add_test(self, page_id: str, pre_scan: str, post_scan: str) -> str:
+        test_id = str(uuid.uuid4())
+        self.tests[test_id] = {
+            'id': test_id,
+            'page': page_id,
+            'pre_scan': pre_scan,
+            'post_scan': post_scan,
+            'created': self.now(),
+            'completes': self.completes_at(),
+        }
+        return test_id
+
+
+    def add_case(self, site_id: str) -> dict:
+        case_id = str(uuid.uuid4())
+        self.cases[case_id] = {
+            'id': case_id,
+            'site': site_id,
+            'title': 'mock case',
+            'steps': [
+                {'action': {'type': 'navigate', 'path': '/'}},
+                {'action': {'type': 'click', 'element': '#button'}},
+            ],
+        }
+        return self.cases[case_id]
+
+
+    def add_testcase(self, site_id: str, case_id: str, updates: list=None) -> dict:
+        testcase_id = str(uuid.uuid4())
+        steps = (self.cases.get(case_id) or {}).get('steps') or []
+        self.testcases[testcase_id] = {
+            'id': testcase_id,
+            'site': site_id,
+            'case': case_id,
+            'updates': updates or [],
+            'steps': len(steps),
+            'created': self.now(),
+            'completes': self.completes_at(),
+        }
+        return self.serialize_testcase(self.testcases[testcase_id])
+
+
+    # --- serializers --- #
+
+    def completed(self, obj: dict) -> str:
+        return self.timestamp(obj['completes']) if self.now() >= obj['completes'] else None
+
+
+    def serialize_scan(self, scan: dict) -> dict:
+        return {
+            'id': scan['id'],
+            'page': {'id': scan['page']},
+            'time_created': self.timestamp(scan['created']),
+            'time_completed': self.completed(scan),
+        }
+
+
+    def serialize_page(self, page: dict) -> dict:
+        scan = self.scans.get(page.get('latest_scan'))
+        return {
+            'id': page['id'],
+            'site': {'id': page['site']},
+            'page_url': page['page_url'],
+            'time_created': page['time_created'],
+            'info': {
+                'latest_scan': self.serialize_scan(scan) if scan else None,
+            },
+        }
+
+
+    def serialize_test(self, test: dict) -> dict:
+        completed = self.completed(test)
+        return {
+            'id': test['id'],
+            'page': {'id': test['page']},
+            'pre_scan': {'id': test['pre_scan']},
+            'post_scan': {'id': test['post_scan']},
+            'time_created': self.timestamp(test['created']),
+            'time_completed': completed,
+            'score': self.score if completed else None,
+        }
+
+
+    def serialize_testcase(self, testcase: dict) -> dict:
+        completed = self.completed(testcase)
+        return {
+            'id': testcase['id'],
+            'site': {'id': testcase['site']},
+            'case': {'id': testcase['case']},
+            'time_created': self.timestamp(testcase['created']),
+            'time_completed': completed,
+            'passed': True if completed else None,
+            'steps': [
+                {'action': {'passed': True if completed else None}}
+                for _ in range(testcase['steps'])
+            ],
+        }
+
+
+
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    """
+    Serves the `/v1/ops/site|page|scan|test|case|testcase`
+    routes used by `api.py`, plus `/sites/<id>/...` as each
+    mock `Site`'s pages (with an `ETag` per revision),
+    `/__mock__/stats` for counters and `POST /__mock__/touch`
+    ({"paths": [...]}) to bump pages' revisions
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    state: MockState = None
+
+
+    def setup(self):
+        super().setup()
+        with self.state.lock:
+            self.state.stats['connections'] += 1
+
+
+    def log_message(self, *args):
+        pass
+
+
+    def send_json(self, status: int, body=None, headers: dict=None) -> None:
+        data = b'' if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+            with self.state.lock:
+                self.state.stats['bytes_sent'] += len(data)
+
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length > 0 else b''
+        try:
+            return json.loads(raw or b'{}') or {}
+        except ValueError:
+            return {}
+
+
+    def paginate(self, items: list, query: dict) -> dict:
+
+        """
+        Returns a DRF-style page of "items" with absolute
+        "next" / "previous" links (limit & offset)
+        """
+
+        limit = int(query.get('limit') or self.state.page_size)
+        offset = int(query.get('offset') or 0)
+
+        def link(new_offset: int) -> str:
+            params = {**query, 'limit': limit, 'offset': new_offset}
+            path = urlparse(self.path).path
+            return f'http://{self.headers.get("Host")}{path}?{urlencode(params)}'
+
+        return {
+            'count': len(items),
+            'next': link(offset + limit) if offset + limit < len(items) else None,
+            'previous': link(max(0, offset - limit)) if offset > 0 else None,
+            'results': items[offset:offset + limit],
+        }
+
+
+    def dispatch(self) -> None:
+        state = self.state
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split('/') if p]
+        data = self.read_json()
+
+        # counting requests per route
+        route = f'{self.command} /{"/".join(parts[:3])}'
+        with state.lock:
+            state.stats['requests'] += 1
+            state.stats['routes'][route] = state.stats['routes'].get(route, 0) + 1
+
+        # injected stats & homepages are never delayed or failed
+        if parts[:2] == ['__mock__', 'stats']:
+            with state.lock:
+                stats = json.loads(json.dumps(state.stats))
+            return self.send_json(200, stats)
+        if parts[:2] == ['__mock__', 'touch']:
+            with state.lock:
+                for path in data.get('paths') or []:
+                    state.revisions[path] = state.revisions.get(path, 0) + 1
+            return self.send_json(204)
+        if parts[:2] == ['__mock__', 'fail']:
+            state.fail_next(data.get('route'), *(data.get('statuses') or []))
+            return self.send_json(204)
+        if parts[:1] == ['sites']:
+            with state.lock:
+                revision = state.revisions.get(url.path, 0)
+            return self.send_json(
+                200, {'site': parts[1:], 'revision': revision},
+                headers={'ETag': f'"{revision}"'}
+            )
+
+        # injecting latency & failures
+        if state.latency > 0:
+            time.sleep(state.latency)
+        with state.lock:
+            scripted = state.scripted.get(route)
+            status = scripted.pop(0) if scripted else None
+        if status is not None:
+            with state.lock:
+                state.stats['failures'] += 1
+            return self.send_json(status, {'detail': 'mock failure'})
+        if state.random.random() < state.failure_rate:
+            with state.lock:
+                state.stats['failures'] += 1
+            return self.send_json(
+                state.random.choice([429, 502, 503]),
+                {'detail': 'mock failure'},
+                headers={'Retry-After': '1'}
+            )
+
+        if parts[:2] != ['v1', 'ops'] or len(parts) < 3:
+            return self.send_json(404, {'detail': 'not found'})
+
+        resource, rest = parts[2], parts[3:]
+        handler = getattr(self, f'{self.command.lower()}_{resource}', None)
+        if handler is None:
+            return self.send_json(405, {'detail': 'method not allowed'})
+
+        with state.lock:
+            status, body = handler(query=query, rest=rest, data=data)
+
+        # honoring "fields" projections
+        fields = get_fields(query.get('fields'))
+        if self.command == 'GET' and fields and status == 200:
+            body = project(body, fields)
+        self.send_json(status, body)
+
+
+    do_GET = dispatch
+    do_POST = dispatch
+    do_DELETE = dispatch
+    do_HEAD = dispatch
+
+
+    # --- site --- #
+
+    def get_site(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if query.get('site_id'):
+            site = state.sites.get(query['site_id'])
+            return (200, site) if site else (404, {'detail': 'not found'})
+        return 200, self.paginate(list(state.sites.values()), query)
+
+
+    def post_site(self, query: dict, rest: list, data: dict):
+        if len(rest) == 2 and rest[1] == 'crawl':
+            if rest[0] not in self.state.sites:
+                return 404, {'detail': 'not found'}
+            return 201, {'id': rest[0], 'message': 'crawl started'}
+        site = self.state.add_site(
+            site_url=data.get('site_url'),
+            page_urls=data.get('page_urls')
+        )
+        return 201, site
+
+
+    def delete_site(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if not rest or state.sites.pop(rest[0], None) is None:
+            return 404, {'detail': 'not found'}
+        for page_id in [k for k, v in state.pages.items() if v['site'] == rest[0]]:
+            state.pages.pop(page_id)
+        return 204, None
+
+
+    # --- page --- #
+
+    def get_page(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if query.get('page_id'):
+            page = state.pages.get(query['page_id'])
+            return (200, state.serialize_page(page)) if page else (404, {'detail': 'not found'})
+        pages = [
+            state.serialize_page(p) for p in state.pages.values()
+            if query.get('site_id') is None or p['site'] == query['site_id']
+        ]
+        return 200, self.paginate(pages, query)
+
+
+    def post_page(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if data.get('site_id') not in state.sites:
+            return 404, {'detail': 'site not found'}
+        urls = data.get('page_urls') or [data.get('page_url')]
+        pages = [
+            state.serialize_page(state.add_page(site_id=data['site_id'], page_url=url))
+            for url in urls if url
+        ]
+        if data.get('page_urls'):
+            return 201, {'pages': pages}
+        return 201, pages[0] if pages else {}
+
+
+    def delete_page(self, query: dict, rest: list, data: dict):
+        if not rest or self.state.pages.pop(rest[0], None) is None:
+            return 404, {'detail': 'not found'}
+        return 204, None
+
+
+    # --- scan --- #
+
+    def get_scan(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if query.get('scan_id'):
+            scan = state.scans.get(query['scan_id'])
+            return (200, state.serialize_scan(scan)) if scan else (404, {'detail': 'not found'})
+        scans = [
+            state.serialize_scan(s) for s in reversed(list(state.scans.values()))
+            if s['page'] == query.get('page_id')
+        ]
+        return 200, self.paginate(scans, query)
+
+
+    def post_scan(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if data.get('site_id'):
+            page_ids = [k for k, v in state.pages.items() if v['site'] == data['site_id']]
+        else:
+            page_ids = [data.get('page_id')] if data.get('page_id') in state.pages else []
+        if len(page_ids) == 0:
+            return 404, {'detail': 'not found'}
+        return 201, {'ids': [state.add_scan(page_id=page_id) for page_id in page_ids]}
+
+
+    # --- test --- #
+
+    def get_test(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if query.get('test_id'):
+            test = state.tests.get(query['test_id'])
+            return (200, state.serialize_test(test)) if test else (404, {'detail': 'not found'})
+        tests = [
+            state.serialize_test(t) for t in reversed(list(state.tests.values()))
+            if t['page'] == query.get('page_id')
+        ]
+        return 200, self.paginate(tests, query)
+
+
+    def post_test(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if data.get('page_id') not in state.pages:
+            return 404, {'detail': 'not found'}
+        test_id = state.add_test(
+            page_id=data['page_id'],
+            pre_scan=data.get('pre_scan'),
+            post_scan=data.get('post_scan')
+        )
+        return 201, {'ids': [test_id]}
+
+
+    # --- case & testcase --- #
+
+    def get_case(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if query.get('case_id'):
+            case = state.cases.get(query['case_id'])
+            return (200, case) if case else (404, {'detail': 'not found'})
+        cases = [
+            c for c in state.cases.values()
+            if query.get('site_id') is None or c['site'] == query['site_id']
+        ]
+        return 200, self.paginate(cases, query)
+
+
+    def get_testcase(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if query.get('testcase_id'):
+            testcase = state.testcases.get(query['testcase_id'])
+            return (200, state.serialize_testcase(testcase)) if testcase else (404, {'detail': 'not found'})
+        testcases = [
+            state.serialize_testcase(t) for t in state.testcases.values()
+            if query.get('site_id') is None or t['site'] == query['site_id']
+        ]
+        return 200, self.paginate(testcases, query)
+
+
+    def post_testcase(self, query: dict, rest: list, data: dict):
+        state = self.state
+        if data.get('case_id') not in state.cases:
+            return 404, {'detail': 'case not found'}
+        return 201, state.add_testcase(
+            site_id=data.get('site_id'),
+            case_id=data['case_id'],
+            updates=data.get('updates')
+        )
+
+
+
+
+def build_mock_server(
+        host: str='127.0.0.1', 
+        port: int=8000, 
+        pages: int=5, 
+        **options
+    ) -> ThreadingHTTPServer:
+
+    """
+    Builds (without starting) a mock Cursion API server
+    seeded with one `Site` of "pages" `Pages`. "options" 
+    are passed to `MockState`.
+    """
+
+    state = MockState(**options)
+    handler = type('BoundMockHandler', (MockHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+
+    # pointing each `Site` homepage back at the mock
+    state.root = f'http://{host}:{server.server_address[1]}'
+    state.seed(pages=pages)
+
+    return server
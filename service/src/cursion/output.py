@@ -0,0 +1,65 @@
+import io, sys, threading
+from contextlib import contextmanager
+
+
+
+
+class ThreadLocalStdout(io.TextIOBase):
+
+    """
+    Stand-in for `sys.stdout` that routes writes from any
+    thread which registered a buffer into that buffer, and
+    everything else to the real stdout
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+
+    def target(self):
+        return getattr(self.local, 'buffer', None) or self.stream
+
+
+    def write(self, text: str) -> int:
+        return self.target().write(text)
+
+
+    def flush(self) -> None:
+        self.target().flush()
+
+
+    def isatty(self) -> bool:
+        return self.stream.isatty()
+
+
+    def fileno(self) -> int:
+        return self.stream.fileno()
+
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.stream, 'encoding', 'utf-8')
+
+
+
+
+@contextmanager
+def capture_thread_output():
+
+    """
+    Captures everything the current thread prints (incl.
+    `rich.print`) into a buffer, leaving other threads'
+    output untouched
+    """
+
+    if not isinstance(sys.stdout, ThreadLocalStdout):
+        sys.stdout = ThreadLocalStdout(sys.stdout)
+
+    buffer = io.StringIO()
+    previous = getattr(sys.stdout.local, 'buffer', None)
+    sys.stdout.local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        sys.stdout.local.buffer = previous
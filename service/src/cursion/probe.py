@@ -0,0 +1,108 @@
+import random, time, requests
+from concurrent.futures import ThreadPoolExecutor
+from .transport import send_request
+
+# (connect, read) seconds allowed per probe attempt
+PROBE_TIMEOUT = (3.05, 10)
+
+
+
+
+def probe_url(url: str, timeout: tuple=PROBE_TIMEOUT) -> int:
+
+    """
+    Returns the status code of "url" without downloading
+    its body - HEAD first, falling back to a streamed GET
+    (closed right after the headers) when HEAD is refused.
+    Returns None if the request failed or timed out.
+    Probes are never retried - `wait_for_urls` does the
+    backing off - nor count against a circuit breaker.
+    """
+
+    try:
+        res = send_request(
+            'HEAD',
+            url=url,
+            timeout=timeout,
+            allow_redirects=True,
+            retries=0,
+            circuit=False
+        )
+        if res.status_code in (405, 501):
+            res = send_request(
+                'GET',
+                url=url,
+                timeout=timeout,
+                allow_redirects=True,
+                stream=True,
+                retries=0,
+                circuit=False
+            )
+        res.close()
+        return res.status_code
+
+    except requests.RequestException:
+        return None
+
+
+
+
+def probe_urls(urls: list, timeout: tuple=PROBE_TIMEOUT, executor: ThreadPoolExecutor=None) -> list:
+
+    """
+    Probes every url at once - returns their status
+    codes in "urls" order
+    """
+
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(1, min(len(urls), 10))) as executor:
+            return probe_urls(urls=urls, timeout=timeout, executor=executor)
+
+    return list(executor.map(lambda url: probe_url(url=url, timeout=timeout), urls))
+
+
+
+
+def is_available(status: int) -> bool:
+    return status is not None and not str(status).startswith('5')
+
+
+
+
+def wait_for_urls(
+        urls: list,
+        max_wait_time: float=900,
+        timeout: tuple=PROBE_TIMEOUT,
+        initial_interval: float=1,
+        max_interval: float=30,
+    ) -> bool:
+
+    """
+    Probes "urls" until every one answers without a 5xx
+    (or error), backing off exponentially with jitter
+    between attempts. Returns False if "max_wait_time"
+    runs out first.
+    """
+
+    deadline = time.monotonic() + max_wait_time
+    pending = list(dict.fromkeys(urls))
+    interval = initial_interval
+    with ThreadPoolExecutor(max_workers=max(1, min(len(pending), 10))) as executor:
+        while True:
+            # never letting one attempt outlive the deadline
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            attempt_timeout = tuple(min(t, remaining) for t in timeout)
+
+            statuses = probe_urls(urls=pending, timeout=attempt_timeout, executor=executor)
+            pending = [url for url, status in zip(pending, statuses) if not is_available(status)]
+            if len(pending) == 0:
+                return True
+
+            # backing off before next attempt
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(remaining, interval * random.uniform(0.8, 1.2)))
+            interval = min(max_interval, interval * 2)
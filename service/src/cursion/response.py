@@ -0,0 +1,160 @@
+import json
+from collections.abc import Mapping
+
+_loads = None
+
+
+
+
+def get_loads():
+
+    """
+    Returns `orjson.loads` when orjson is installed
+    (pip install cursion[fast]) - else `json.loads`
+    """
+
+    global _loads
+    if _loads is None:
+        try:
+            import orjson
+            _loads = orjson.loads
+        except ImportError:
+            _loads = json.loads
+
+    return _loads
+
+
+
+
+def decode(content: bytes):
+
+    """
+    Decodes a response body - None when it is empty
+    (e.g. a 204) and the plain text when it is not JSON
+    (e.g. a proxy's 502 page)
+    """
+
+    if not content or not content.strip():
+        return None
+    try:
+        return get_loads()(content)
+    except ValueError:
+        return content.decode('utf-8', errors='replace')
+
+
+
+
+def get_fields(fields) -> list:
+
+    """
+    Normalizes "fields" - a list or a comma-separated
+    string - into a list, or None when empty
+    """
+
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = [field.strip() for field in fields if field and field.strip()]
+
+    return fields or None
+
+
+
+
+def project(data, fields: list):
+
+    """
+    Trims "data" - one record, a list of records or a
+    paginated listing - down to "fields". Nested keys
+    are dotted (e.g. "info.latest_scan.id") and "id" is
+    always kept. Missing keys are left out.
+    """
+
+    tree = {'id': {}}
+    for field in fields:
+        node = tree
+        for key in field.split('.'):
+            node = node.setdefault(key, {})
+
+    def pick(record, tree: dict):
+        if isinstance(record, list):
+            return [pick(item, tree) for item in record]
+        if not isinstance(record, dict) or not tree:
+            return record
+        return {
+            key: pick(record[key], sub) 
+            for key, sub in tree.items() if key in record
+        }
+
+    # paginated listings keep their envelope
+    if isinstance(data, dict) and isinstance(data.get('results'), list) and 'id' not in data:
+        return {**data, 'results': pick(data['results'], tree)}
+
+    return pick(data, tree)
+
+
+
+
+class ApiResponse(Mapping):
+
+    """
+    Read-only {'success', 'data'} envelope for an API
+    response. "success" comes from the status code alone;
+    "data" is only decoded on first access - so callers
+    reading just "success" never pay for the JSON. An
+    optional "transform" is applied to successful data 
+    right after decoding (e.g. to trim it to a few fields).
+    """
+
+    __slots__ = ('status_code', 'content', 'transform', '_data', '_decoded')
+
+    def __init__(self, status_code: int, content: bytes, transform=None):
+        self.status_code = status_code
+        self.content = content
+        self.transform = transform
+        self._data = None
+        self._decoded = False
+
+
+    @classmethod
+    def from_response(cls, response, transform=None):
+        return cls(response.status_code, response.content, transform=transform)
+
+
+    @property
+    def success(self) -> bool:
+        return str(self.status_code).startswith('2')
+
+
+    @property
+    def data(self):
+        if not self._decoded:
+            data = decode(self.content)
+            if self.transform is not None and data is not None and self.success:
+                data = self.transform(data)
+            self._data = data
+            self._decoded = True
+            # dropping the raw body once decoded
+            self.content = None
+        return self._data
+
+
+    def __getitem__(self, key: str):
+        if key == 'success':
+            return self.success
+        if key == 'data':
+            return self.data
+        raise KeyError(key)
+
+
+    def __iter__(self):
+        return iter(('success', 'data'))
+
+
+    def __len__(self) -> int:
+        return 2
+
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
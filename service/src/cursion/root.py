@@ -1,22 +1,58 @@
-import typer, os, json, time, shutil
-from pathlib import Path
+import typer, os, sys, json, threading
+from enum import Enum
 from typing import List
-from dotenv import load_dotenv
-from pprint import pprint
+from contextlib import contextmanager, redirect_stdout
 from rich import print as rprint
-from .api import *
+from .config import env_dir, env_file, API_ROOT, POLL_CONCURRENCY, ADD_PAGES_CHUNK_SIZE
 
 
 # High Level Configs
 
 app = typer.Typer()
-env_dir = Path(str(Path.home()) + '/cursion')
-env_file = Path(str(Path.home()) + '/cursion/.env')
 
-load_dotenv(dotenv_path=env_file)
+# span kinds reported as results by `test-site` & co.
+RESULT_KINDS = ('availability', 'pages', 'phase', 'test_result', 'testcase_result')
 
-API_KEY = f'Token {os.getenv('API_KEY')}'
-API_ROOT = f'{os.getenv('API_ROOT') if os.getenv('API_ROOT') is not None else 'https://api.cursion.dev'}'
+
+
+
+class Output(str, Enum):
+
+    """ 
+    Output modes - "table" is the rich, human-readable
+    default; "json" & "ndjson" are plain, parseable JSON
+    """
+
+    table = 'table'
+    json = 'json'
+    ndjson = 'ndjson'
+
+# NOTE: `.api` (and with it `requests`) is imported inside 
+# each command so `--help` & `check` never pay for it
+
+
+
+
+@app.callback()
+def main(
+        ctx: typer.Context,
+        trace: str=typer.Option(None, help='write a JSON span per API call & polling round to this file'),
+        metrics_file: str=typer.Option(None, help='write run metrics to this Prometheus textfile on exit')
+    ) -> None:
+
+    """ 
+    Cursion CLI - global options go before the command,
+    e.g. `cursion --trace run.jsonl test-site <site_id>`
+    """
+
+    if trace is not None:
+        from .tracing import enable_trace
+        enable_trace(trace)
+
+    if metrics_file is not None:
+        from .metrics import enable_metrics
+        metrics = enable_metrics(command=ctx.invoked_subcommand)
+        ctx.call_on_close(lambda: metrics.write(metrics_file))
 
 
 
@@ -30,17 +66,23 @@ def config(api_key: str, api_root: str='https://api.cursion.dev') -> None:
     Setup and configure the Cursion CLI for initial use 
     """
 
-    # deleting $HOME/cursion/.env if exists
-    if env_dir.exists():
-        shutil.rmtree(env_dir)
-    
-    # creating new $HOME/cursion dir
-    os.mkdir(env_dir)
+    # creating $HOME/cursion dir - leaving the runs, 
+    # fingerprints & cache already in it alone
+    env_dir.mkdir(parents=True, exist_ok=True)
+
+    # keeping any other settings from the old .env
+    lines = env_file.read_text().splitlines() if env_file.exists() else []
+    lines = [
+        line for line in lines 
+        if line.split('=')[0].strip() not in ('API_KEY', 'API_ROOT')
+    ]
 
     # adding new configs tp .env
     with open(env_file, "w") as f:
         f.write(f'API_KEY={api_key}\n')
         f.write(f'API_ROOT={api_root}\n')
+        for line in lines:
+            f.write(f'{line}\n')
     
     # print response
     rprint(
@@ -93,12 +135,24 @@ def check_key_and_root():
 
 
 @app.command()
-def check():
+def check(output: Output=Output.table):
     
     """ 
     Check that Cursion CLI is properly configured
     """
 
+    # reporting checks as JSON
+    if output != Output.table:
+        checks = {
+            'env_file': env_file.exists(),
+            'api_key': env_file.exists() and len(os.getenv('API_KEY') or '') > 0,
+            'api_root': env_file.exists() and len(os.getenv('API_ROOT') or '') > 0,
+        }
+        write_json({'success': all(checks.values()), **checks})
+        if not all(checks.values()):
+            raise typer.Exit(code=1)
+        return
+
     # completing checks
     success = True
     if not env_file.exists():
@@ -146,12 +200,39 @@ def check():
 
 
 
-def print_formated_response(response: dict, verbose: bool=True) -> None: 
+def write_json(record, indent: int=None) -> None:
+
+    """ 
+    Writes "record" to stdout as one line of JSON (or
+    indented) - no rich markup
+    """
+
+    sys.stdout.write(json.dumps(record, indent=indent, default=str) + '\n')
+    sys.stdout.flush()
+
+
+
+
+def print_formated_response(response: dict, verbose: bool=True, output: Output=Output.table) -> None: 
 
     """ 
-    Generic formatter for any api response 
+    Generic formatter for any api response - in "json"
+    & "ndjson" modes a failed response exits with code 1
     """
 
+    if output != Output.table:
+        data = response['data']
+        if output == Output.json:
+            write_json(dict(response), indent=2)
+        elif isinstance(data, dict) and isinstance(data.get('results'), list):
+            for record in data['results']:
+                write_json(record)
+        else:
+            write_json(data)
+        if not response['success']:
+            raise typer.Exit(code=1)
+        return
+
     if response['success']:
         rprint('[green bold]' + u'\u2714' + '[/green bold] Success')
     if not response['success']:
@@ -162,13 +243,105 @@ def print_formated_response(response: dict, verbose: bool=True) -> None:
 
 
 
+def print_streamed_response(records, verbose: bool=True, output: Output=Output.table) -> None: 
+
+    """ 
+    Prints each record of a listing as it arrives - as 
+    one JSON line per record in "ndjson" mode, or as a 
+    JSON array written record by record in "json" mode
+    """
+
+    if output == Output.ndjson:
+        for record in records:
+            write_json(record)
+        return
+
+    if output == Output.json:
+        sys.stdout.write('[')
+        for i, record in enumerate(records):
+            sys.stdout.write((',\n' if i > 0 else '\n') + json.dumps(record, default=str))
+        sys.stdout.write('\n]\n')
+        sys.stdout.flush()
+        return
+
+    count = 0
+    for record in records:
+        if verbose:
+            rprint(record)
+        count += 1
+    rprint('[green bold]' + u'\u2714' + '[/green bold]' + f' Success - {count} records')
+
+
+
+
+def print_request_stats() -> None: 
+
+    """ 
+    Prints how many requests were retried or throttled
+    during a run - if any were
+    """
+
+    from .transport import get_stats
+
+    stats = get_stats()
+    if stats['retries'] > 0 or stats['throttled'] > 0:
+        rprint(
+            f'\n{stats["requests"]} requests - {stats["retries"]} retried, '
+            f'{stats["throttled"]} throttled, {stats["circuit_trips"]} circuit trip(s)'
+        )
+
+
+
+
+@contextmanager
+def flow_output(output: Output=Output.table, collect: bool=False):
+
+    """ 
+    In "json" & "ndjson" modes, moves a flow's progress
+    output to stderr and collects its results (the spans
+    in `RESULT_KINDS`) into the yielded list - "ndjson"
+    also streams each one to stdout as it arrives. With
+    "collect", results are gathered in "table" mode too.
+    """
+
+    if output == Output.table and not collect:
+        yield []
+        return
+
+    from .tracing import add_listener, remove_listener
+
+    records = []
+    stdout = sys.stdout
+    lock = threading.Lock()
+
+    def listener(span: dict) -> None:
+        if span['kind'] not in RESULT_KINDS:
+            return
+        with lock:
+            records.append(span)
+            if output == Output.ndjson:
+                stdout.write(json.dumps(span, default=str) + '\n')
+                stdout.flush()
+
+    add_listener(listener)
+    try:
+        with redirect_stdout(sys.stderr if output != Output.table else sys.stdout):
+            yield records
+    finally:
+        remove_listener(listener)
+
+
+
+
 @app.command()
-def add_site(site_url: str, v: bool=True, api_key: str=None):
+def add_site(site_url: str, v: bool=True, output: Output=Output.table, api_key: str=None):
 
     """ 
     Add a `Site` object to your Cursion account
     """
 
+    from .api import api_add_site
+
     # sending request
     resp = api_add_site(
         site_url=site_url, 
@@ -179,42 +352,60 @@ def add_site(site_url: str, v: bool=True, api_key: str=None):
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
     
 
 @app.command()
-def get_sites(site_id: str=None, v: bool=True, api_key: str=None):
+def get_sites(site_id: str=None, v: bool=True, output: Output=Output.table, stream: bool=False, cache: bool=False, refresh: bool=False, fields: str=None, api_key: str=None):
 
     """ 
     Get one or more `Site` objects associated
     with your account
     """
 
+    from .api import api_get_sites, iter_sites
+
+    # streaming records
+    if (stream or output == Output.ndjson) and site_id is None:
+        print_streamed_response(
+            records=iter_sites(fields=fields, api_key=api_key),
+            verbose=v,
+            output=output
+        )
+        return
+
     # sending request
     resp = api_get_sites(
         site_id=site_id,
-        api_key=api_key, 
+        fields=fields,
+        api_key=api_key,
+        cache=cache,
+        refresh=refresh,
     )
 
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def crawl_site(site_id: str, v: bool=True, api_key: str=None):
+def crawl_site(site_id: str, v: bool=True, output: Output=Output.table, api_key: str=None):
 
     """ 
     Crawl a specific `Site` for new `Page` objects
     """
 
+    from .api import api_crawl_site
+
     # sending request
     resp = api_crawl_site(
         site_id=site_id,
@@ -224,19 +415,22 @@ def crawl_site(site_id: str, v: bool=True, api_key: str=None):
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def delete_site(site_id: str, v: bool=True, api_key: str=None):
+def delete_site(site_id: str, v: bool=True, output: Output=Output.table, api_key: str=None):
 
     """ 
     Delete a specific `Site` object 
     """
 
+    from .api import api_delete_site
+
     # sending request
     resp = api_delete_site(
         site_id=site_id, 
@@ -246,19 +440,22 @@ def delete_site(site_id: str, v: bool=True, api_key: str=None):
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def add_page(site_id: str, page_url: str, v: bool=True, api_key: str=None):
+def add_page(site_id: str, page_url: str, v: bool=True, output: Output=Output.table, api_key: str=None):
 
     """ 
     Add a new `Page` object to a specific `Site` object
     """
 
+    from .api import api_add_page
+
     # sending request
     resp = api_add_page(
         site_id=site_id, 
@@ -269,43 +466,116 @@ def add_page(site_id: str, page_url: str, v: bool=True, api_key: str=None):
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def get_pages(page_id: str=None, site_id: str=None, v: bool=True, api_key: str=None):
+def add_pages(
+        site_id: str=typer.Option(...),
+        from_file: str=typer.Option(..., help='URL list or sitemap (path, URL or "-" for stdin; may be gzipped)'),
+        chunk_size: int=ADD_PAGES_CHUNK_SIZE,
+        concurrency: int=4,
+        dedupe: bool=True,
+        output: Output=Output.table,
+        api_key: str=None
+    ):
+
+    """ 
+    Add many new `Page` objects to a specific `Site` 
+    object from a list of URLs (one per line) or an XML 
+    sitemap / sitemap index - sent in chunks, skipping 
+    URLs the `Site` already has
+    """
+
+    from .api import api_add_pages
+    from .sitemap import iter_urls
+
+    # sending requests - progress goes to stderr 
+    # when printing JSON
+    with redirect_stdout(sys.stderr if output != Output.table else sys.stdout):
+        counts = api_add_pages(
+            site_id=site_id,
+            page_urls=iter_urls(from_file),
+            chunk_size=chunk_size,
+            concurrency=concurrency,
+            dedupe=dedupe,
+            api_key=api_key,
+        )
+
+    # printing results
+    if output != Output.table:
+        write_json({'site_id': site_id, **counts}, indent=2 if output == Output.json else None)
+    elif counts['failed'] == 0:
+        rprint(
+            '[green bold]' + u'\u2714' + '[/green bold]' + 
+            f' added {counts["added"]} pages ({counts["skipped"]} skipped)'
+        )
+    else:
+        rprint(
+            '[red bold]' + u'\u2718' + '[/red bold]' + 
+            f' added {counts["added"]} pages ({counts["skipped"]} skipped, {counts["failed"]} failed)'
+        )
+        for error in counts['errors']:
+            rprint(f' {error["urls"]} urls from {error["first_url"]} : {error["error"]}')
+
+    if counts['failed'] > 0:
+        raise typer.Exit(code=1)
+
+
+
+
+@app.command()
+def get_pages(page_id: str=None, site_id: str=None, v: bool=True, output: Output=Output.table, stream: bool=False, cache: bool=False, refresh: bool=False, fields: str=None, api_key: str=None):
 
     """ 
     Get one or more `Page` objects associated
     with a specific `Site`
     """
 
+    from .api import api_get_pages, iter_pages
+
+    # streaming records
+    if (stream or output == Output.ndjson) and page_id is None:
+        print_streamed_response(
+            records=iter_pages(site_id=site_id, fields=fields, api_key=api_key),
+            verbose=v,
+            output=output
+        )
+        return
+
     # sending request
     resp = api_get_pages(
         page_id=page_id, 
         site_id=site_id, 
+        fields=fields,
         api_key=api_key,
+        cache=cache,
+        refresh=refresh,
     )
 
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def delete_page(page_id: str, v: bool=True, api_key: str=None):
+def delete_page(page_id: str, v: bool=True, output: Output=Output.table, api_key: str=None):
 
     """ 
     Delete a specific `Page` object 
     """
 
+    from .api import api_delete_page
+
     # sending request
     resp = api_delete_page(
         page_id=page_id,
@@ -315,20 +585,23 @@ def delete_page(page_id: str, v: bool=True, api_key: str=None):
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def scan_site(site_id: str, v: bool=True, api_key: str=None):
+def scan_site(site_id: str, v: bool=True, output: Output=Output.table, api_key: str=None):
 
     """ 
     Create new `Scan` objects for each `Page` associated
     with a specific `Site`
     """
 
+    from .api import api_scan_site
+
     # sending request
     resp = api_scan_site(
         site_id=site_id, 
@@ -338,19 +611,22 @@ def scan_site(site_id: str, v: bool=True, api_key: str=None):
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def scan_page(page_id: str, v: bool=True, api_key: str=None):
+def scan_page(page_id: str, v: bool=True, output: Output=Output.table, api_key: str=None):
 
     """ 
     Create a new `Scan` object for a specific `Page`
     """
 
+    from .api import api_scan_page
+
     # sending request
     resp = api_scan_page(
         page_id=page_id, 
@@ -360,43 +636,59 @@ def scan_page(page_id: str, v: bool=True, api_key: str=None):
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def get_scans(scan_id: str=None, page_id: str=None, v: bool=True, api_key: str=None):
+def get_scans(scan_id: str=None, page_id: str=None, v: bool=True, output: Output=Output.table, stream: bool=False, fields: str=None, api_key: str=None):
 
     """ 
     Get one or more `Scan` objects associated
     with a specific `Page`
     """
 
+    from .api import api_get_scans, iter_scans
+
+    # streaming records
+    if (stream or output == Output.ndjson) and scan_id is None:
+        print_streamed_response(
+            records=iter_scans(page_id=page_id, fields=fields, api_key=api_key),
+            verbose=v,
+            output=output
+        )
+        return
+
     # sending request
     resp = api_get_scans(
         scan_id=scan_id, 
         page_id=page_id, 
+        fields=fields,
         api_key=api_key,
     )
 
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def test_page(page_id: str, pre_scan_id: str, post_scan_id: str, v: bool=True, api_key: str=None):
+def test_page(page_id: str, pre_scan_id: str, post_scan_id: str, v: bool=True, output: Output=Output.table, api_key: str=None):
 
     """ 
     Create a new `Test` for a specific `Page`
     """
 
+    from .api import api_test_page
+
     # sending request
     resp = api_test_page(
         page_id=page_id, 
@@ -408,31 +700,45 @@ def test_page(page_id: str, pre_scan_id: str, post_scan_id: str, v: bool=True, a
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
 
 
 @app.command()
-def get_tests(page_id: str=None, test_id: str=None, v: bool=True, api_key: str=None):
+def get_tests(page_id: str=None, test_id: str=None, v: bool=True, output: Output=Output.table, stream: bool=False, fields: str=None, api_key: str=None):
 
     """ 
     Get one or more `Test` objects associated
     with a specific `Page`
     """
 
+    from .api import api_get_tests, iter_tests
+
+    # streaming records
+    if (stream or output == Output.ndjson) and test_id is None:
+        print_streamed_response(
+            records=iter_tests(page_id=page_id, fields=fields, api_key=api_key),
+            verbose=v,
+            output=output
+        )
+        return
+
     # sending request
     resp = api_get_tests(
         page_id=page_id, 
         test_id=test_id,
+        fields=fields,
         api_key=api_key,
     )
 
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
@@ -441,24 +747,96 @@ def get_tests(page_id: str=None, test_id: str=None, v: bool=True, api_key: str=N
 @app.command()
 def test_site(
         site_id: str, 
-        max_wait_time :int=120,
+        max_wait_time :int=900,
         threshold: int=90,
-        api_key: str=None
+        api_key: str=None,
+        concurrency: int=POLL_CONCURRENCY,
+        pipeline: bool=False,
+        probe_url: List[str]=typer.Option(None),
+        budget: float=None,
+        checkpoint: bool=True,
+        resume: str=typer.Option(None, help='RUN_ID of an earlier run to continue'),
+        incremental: bool=typer.Option(False, help='only scan & test pages whose content changed'),
+        full: bool=typer.Option(False, help='with --incremental, test every page but refresh fingerprints'),
+        shard: str=typer.Option(None, help='K/N - only test the K-th of N stable partitions of the pages'),
+        results_file: str=typer.Option(None, help='write the JSON results here (default with --shard: cursion-shard-K-of-N.json)'),
+        output: Output=Output.table
     ):
 
     """ 
     Run a full `Test` of all the `Page` objects associated
-    with a specific `Site`
+    with a specific `Site` - "--budget" caps the whole run 
+    in seconds (exit code 3 with a partial report if it 
+    runs out). Each run is checkpointed to
+    $HOME/cursion/runs/<run_id>.json - "--resume <run_id>"
+    continues it without re-creating any scans or tests.
+    "--incremental" skips pages unchanged since they last 
+    passed ("--full" tests them all anyway). "--shard K/N"
+    splits the pages across N runners - combine their
+    result files with `merge-results`
     """
 
-    # sending request
-    resp = api_test_site(
-        site_id=site_id, 
-        max_wait_time=max_wait_time,
-        threshold=threshold,
-        api_key=api_key,
-    )
+    from .api import api_test_site
+    from .budget import BudgetExhausted, BUDGET_EXIT_CODE
+    from .runs import new_run_id, PhaseTimedOut, TIMEOUT_EXIT_CODE
+    from .sharding import parse_shard
+
+    # naming the run
+    run_id = resume or (new_run_id() if checkpoint else None)
 
+    # parsing the shard
+    _shard = None
+    if shard is not None:
+        try:
+            _shard = parse_shard(shard)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint='--shard')
+        results_file = results_file or f'cursion-shard-{_shard[0]}-of-{_shard[1]}.json'
+
+    # sending request
+    exhausted = timed_out = False
+    with flow_output(output, collect=results_file is not None) as records:
+        try:
+            resp = api_test_site(
+                site_id=site_id, 
+                max_wait_time=max_wait_time,
+                threshold=threshold,
+                api_key=api_key,
+                concurrency=concurrency,
+                pipeline=pipeline,
+                probe_urls=probe_url,
+                budget=budget,
+                run_id=run_id,
+                resume=resume is not None,
+                incremental=incremental,
+                full=full,
+                shard=_shard,
+            )
+        except BudgetExhausted:
+            resp, exhausted = False, True
+        except PhaseTimedOut:
+            resp, timed_out = False, True
+        print_request_stats()
+
+    # printing results
+    result = {
+        'site_id': site_id, 
+        'run_id': run_id,
+        'shard': shard,
+        'passed': bool(resp), 
+        'exhausted': exhausted,
+        'results': records
+    }
+    if output == Output.json:
+        write_json(result, indent=2)
+    if results_file is not None:
+        with open(results_file, 'w') as f:
+            json.dump(result, f, indent=2, default=str)
+
+    if exhausted:
+        raise typer.Exit(code=BUDGET_EXIT_CODE)
+    if timed_out:
+        raise typer.Exit(code=TIMEOUT_EXIT_CODE)
     if not resp:
         raise Exception('- Cursion Tests Failed -')
 
@@ -468,24 +846,161 @@ def test_site(
 
 
 @app.command()
-def get_cases(case_id: str=None, site_id: str=None, v: bool=True, api_key: str=None):
+def test_sites(
+        site_ids: List[str]=typer.Argument(None),
+        from_file: str=None,
+        max_wait_time :int=900,
+        threshold: int=90,
+        api_key: str=None,
+        concurrency: int=POLL_CONCURRENCY,
+        sites_concurrency: int=10,
+        max_in_flight: int=50,
+        pipeline: bool=False,
+        probe_url: List[str]=typer.Option(None),
+        budget: float=None,
+        output: Output=Output.table
+    ):
+
+    """ 
+    Run a full `Test` of many `Sites` concurrently - pass 
+    site ids and/or a file of them (one per line, "-" for stdin)
+    """
+
+    from .api import api_test_sites
+    from .budget import BUDGET_EXIT_CODE
+
+    # collecting site ids
+    site_ids = list(site_ids or [])
+    if from_file is not None:
+        f = sys.stdin if from_file == '-' else open(from_file)
+        with f:
+            for line in f:
+                line = line.split('#')[0].strip()
+                if line:
+                    site_ids.append(line)
+
+    if len(site_ids) == 0:
+        rprint(
+            '[red bold]' + u'\u2718' + '[/red bold]' +
+            ' please pass one or more site ids or --from-file'
+        )
+        raise typer.Exit(code=2)
+
+    # sending request
+    with flow_output(output) as records:
+        results = api_test_sites(
+            site_ids=site_ids, 
+            max_wait_time=max_wait_time,
+            threshold=threshold,
+            api_key=api_key,
+            concurrency=concurrency,
+            sites_concurrency=sites_concurrency,
+            max_in_flight=max_in_flight,
+            pipeline=pipeline,
+            probe_urls=probe_url,
+            budget=budget,
+        )
+        print_request_stats()
+
+    # printing results - without each site's captured output
+    summaries = [
+        {k: v for k, v in result.items() if k != 'output'} 
+        for result in results
+    ]
+    if output == Output.ndjson:
+        for summary in summaries:
+            write_json({'kind': 'site', **summary})
+    if output == Output.json:
+        write_json({'sites': summaries, 'results': records}, indent=2)
+
+    if any(result['exhausted'] for result in results):
+        raise typer.Exit(code=BUDGET_EXIT_CODE)
+    if not all(result['passed'] for result in results):
+        raise Exception('- Cursion Tests Failed -')
+
+
+
+
+
+
+@app.command()
+def merge_results(
+        files: List[str]=typer.Argument(..., help='result files written by `test-site --shard K/N`'),
+        output: Output=Output.table
+    ):
+
+    """ 
+    Combine the result files of a sharded `test-site`
+    run into one verdict - failing if any shard failed
+    or is missing
+    """
+
+    from .sharding import merge_results as _merge_results
+    from .budget import BUDGET_EXIT_CODE
+
+    merged = _merge_results(files)
+
+    # printing results
+    if output != Output.table:
+        write_json(merged, indent=2 if output == Output.json else None)
+    else:
+        print(f'Shards summary ({merged["site_id"]}):')
+        for shard, result in merged['by_shard'].items():
+            if result['passed']:
+                rprint(' [green bold]' + u'\u2714' + '[/green bold]' + f' passed : shard {shard}')
+            else:
+                rprint(' [red bold]' + u'\u2718' + '[/red bold]' + f' failed : shard {shard}')
+        for k in merged['missing']:
+            rprint(' [red bold]' + u'\u2718' + '[/red bold]' + f' missing : shard {k}/{merged["shards"]}')
+        print(
+            f'\n{merged["pages"]} pages - {merged["tests_passed"]} tests passed, '
+            f'{merged["tests_failed"]} failed'
+        )
+
+    if merged['exhausted']:
+        raise typer.Exit(code=BUDGET_EXIT_CODE)
+    if not merged['passed']:
+        raise Exception('- Cursion Tests Failed -')
+
+
+
+
+
+
+@app.command()
+def get_cases(case_id: str=None, site_id: str=None, v: bool=True, output: Output=Output.table, stream: bool=False, cache: bool=False, refresh: bool=False, fields: str=None, api_key: str=None):
 
     """ 
     Get one or more `Cases` objects associated
     with a specific `Site`
     """
 
+    from .api import api_get_cases, iter_cases
+
+    # streaming records
+    if (stream or output == Output.ndjson) and case_id is None:
+        print_streamed_response(
+            records=iter_cases(site_id=site_id, fields=fields, api_key=api_key),
+            verbose=v,
+            output=output
+        )
+        return
+
     # sending request
     resp = api_get_cases(
         site_id=site_id, 
         case_id=case_id,
+        fields=fields,
         api_key=api_key,
+        cache=cache,
+        refresh=refresh,
     )
 
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
@@ -493,24 +1008,39 @@ def get_cases(case_id: str=None, site_id: str=None, v: bool=True, api_key: str=N
 
 
 @app.command()
-def get_testcases(testcase_id: str=None, site_id: str=None, v: bool=True, api_key: str=None):
+def get_testcases(testcase_id: str=None, site_id: str=None, v: bool=True, output: Output=Output.table, stream: bool=False, cache: bool=False, refresh: bool=False, fields: str=None, api_key: str=None):
 
     """ 
     Get one or more `Testcases` objects associated
     with a specific `Site`
     """
 
+    from .api import api_get_testcases, iter_testcases
+
+    # streaming records
+    if (stream or output == Output.ndjson) and testcase_id is None:
+        print_streamed_response(
+            records=iter_testcases(site_id=site_id, fields=fields, api_key=api_key),
+            verbose=v,
+            output=output
+        )
+        return
+
     # sending request
     resp = api_get_testcases(
         site_id=site_id, 
         testcase_id=testcase_id,
+        fields=fields,
         api_key=api_key,
+        cache=cache,
+        refresh=refresh,
     )
 
     # printing output
     print_formated_response(
         response=resp,
-        verbose=v
+        verbose=v,
+        output=output
     )
 
 
@@ -525,8 +1055,11 @@ def get_testcases(testcase_id: str=None, site_id: str=None, v: bool=True, api_ke
 def testcase_site(
         site_id: str,
         case_id: str, 
-        max_wait_time :int=120,
+        max_wait_time :int=900,
         api_key: str=None,
+        concurrency: int=POLL_CONCURRENCY,
+        probe_url: List[str]=typer.Option(None),
+        output: Output=Output.table,
         updates: typer.Context=None
     ):
 
@@ -534,20 +1067,110 @@ def testcase_site(
     Run a full `Testcase` of a specific `Site`
     """
 
+    from .api import api_testcase_site
+
     # sending request
-    resp = api_testcase_site(
-        site_id=site_id, 
-        case_id=case_id, 
-        max_wait_time=max_wait_time,
-        api_key=api_key,
-        updates=updates.args
-    )
+    with flow_output(output) as records:
+        resp = api_testcase_site(
+            site_id=site_id, 
+            case_id=case_id, 
+            max_wait_time=max_wait_time,
+            api_key=api_key,
+            updates=updates.args,
+            concurrency=concurrency,
+            probe_urls=probe_url,
+        )
+        print_request_stats()
+
+    # printing results
+    if output == Output.json:
+        write_json({
+            'site_id': site_id, 
+            'case_id': case_id, 
+            'passed': bool(resp), 
+            'results': records
+        }, indent=2)
 
     if not resp:
         raise Exception('- Cursion Testcase Failed -')
 
 
 
+@app.command()
+def mock_server(
+        host: str='127.0.0.1',
+        port: int=8000,
+        pages: int=5,
+        delay: float=5,
+        delay_jitter: float=0,
+        failure_rate: float=0,
+        latency: float=0,
+        page_size: int=50,
+        score: float=98,
+        seed: int=None
+    ):
+
+    """ 
+    Run a local mock Cursion API for offline 
+    benchmarking & testing
+    """
+
+    from .mock import build_mock_server
+
+    # building server
+    server = build_mock_server(
+        host=host,
+        port=port,
+        pages=pages,
+        delay=delay,
+        delay_jitter=delay_jitter,
+        failure_rate=failure_rate,
+        latency=latency,
+        page_size=page_size,
+        score=score,
+        seed=seed,
+    )
+    state = server.state
+
+    # printing configs
+    rprint(
+        '[green bold]' + u'\u2714' + '[/green bold]' + 
+        f' mock Cursion API running - point the CLI at it with:\n'
+    )
+    rprint(f" API_ROOT={state.root} API_KEY=mock-key-0000000000000000")
+    rprint(f"\n site_id  : {state.default_site['id']}")
+    rprint(f" case_id  : {state.default_case['id']}")
+    rprint(f" stats    : {state.root}/__mock__/stats\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+
+
+@app.command()
+def serve(socket: str=typer.Option(None, help='Unix socket to listen on (default $HOME/cursion/cursion.sock or $CURSION_SOCKET)')):
+
+    """ 
+    Run a local daemon that keeps the API session, its
+    warm connections & caches between commands - other
+    commands forward to it while it runs and fall back 
+    to running in-process when it does not
+    """
+
+    from .daemon import serve as _serve, SOCKET_PATH
+
+    # warming imports once for every command
+    from . import api
+
+    _serve(app, socket_path=socket or SOCKET_PATH)
+
+
+
+
 ## --- CLI entry point --- ##
 def root():
-    app()
\ No newline at end of file
+    from .daemon import main
+    main()
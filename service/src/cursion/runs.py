@@ -0,0 +1,135 @@
+import json, os, time, uuid
+from pathlib import Path
+
+runs_dir = Path(str(Path.home()) + '/cursion/runs')
+
+# min seconds between unforced checkpoint writes
+SAVE_INTERVAL = 1.0
+
+# exit code used when a phase times out with ids pending
+TIMEOUT_EXIT_CODE = 4
+
+# seconds a checkpoint is kept for `--resume`
+RUN_RETENTION = 7 * 24 * 3600
+
+
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+
+
+def prune_runs(max_age: float=RUN_RETENTION) -> None:
+
+    """
+    Deletes checkpoints (and stray temp files) last
+    written over "max_age" seconds ago
+    """
+
+    cutoff = time.time() - max_age
+    for path in list(runs_dir.glob('*.json')) + list(runs_dir.glob('*.tmp')):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+    return None
+
+
+
+
+class PhaseTimedOut(Exception):
+
+    """
+    Raised when a `test-site` phase reaches its deadline
+    with "pending" objects unfinished - the run stops
+    there (checkpointed) instead of building on them
+    """
+
+    def __init__(self, phase: str, pending: int, run_id: str=None):
+        self.phase = phase
+        self.pending = pending
+        self.run_id = run_id
+        super().__init__(f'- Cursion run timed out during {phase} with {pending} pending -')
+
+
+
+
+class RunCheckpoint:
+
+    """
+    Local record of one `test-site` run, kept in
+    `$HOME/cursion/runs/<run_id>.json` - the ids of
+    every object the run created and the phase it
+    reached - so `--resume` can pick up polling where
+    a timed out or killed run left off. Deleted once
+    the run passes, else pruned after RUN_RETENTION.
+    """
+
+    def __init__(self, run_id: str, state: dict=None):
+        self.run_id = run_id
+        self.state = state or {}
+        self.saved = 0.0
+
+
+    @property
+    def path(self) -> Path:
+        return runs_dir / f'{self.run_id}.json'
+
+
+    @classmethod
+    def load(cls, run_id: str):
+
+        """
+        Returns the checkpoint of "run_id" - raises
+        `ValueError` when there is none
+        """
+
+        checkpoint = cls(run_id=run_id)
+        try:
+            with open(checkpoint.path) as f:
+                checkpoint.state = json.load(f)
+        except (OSError, ValueError):
+            raise ValueError(f'- no checkpoint found for run {run_id} -')
+
+        return checkpoint
+
+
+    def get(self, key: str, default=None):
+        return self.state.get(key, default)
+
+
+    def update(self, **fields) -> None:
+        self.state.update(fields)
+        self.save()
+
+
+    def due(self) -> bool:
+        return time.monotonic() - self.saved >= SAVE_INTERVAL
+
+
+    def save(self, force: bool=True) -> None:
+
+        """
+        Writes the checkpoint atomically - unless "force"
+        is False and it was written under SAVE_INTERVAL ago
+        """
+
+        if not force and not self.due():
+            return None
+
+        runs_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({**self.state, 'run_id': self.run_id, 'time_updated': time.time()}, f)
+        os.replace(tmp, self.path)
+        self.saved = time.monotonic()
+
+        return None
+
+
+    def delete(self) -> None:
+        self.path.unlink(missing_ok=True)
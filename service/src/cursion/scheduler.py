@@ -0,0 +1,111 @@
+import random, statistics, time
+
+
+
+
+class PollScheduler:
+
+    """
+    Deadline-driven polling schedule for `wait_for_completion`.
+    Polls start fast and back off exponentially (with jitter)
+    while nothing completes. Once objects start completing,
+    the interval is capped at a fraction ("adaptive_ratio") of
+    the typical observed completion time, so fast batches are
+    polled tightly and slow ones are not over-polled. Only
+    real samples count - objects already complete on the
+    first round say nothing about how long they take - and
+    the cap only applies once "min_samples" were seen.
+    All timing uses `time.monotonic()`.
+    """
+
+    def __init__(
+            self,
+            max_wait_time: float=900,
+            initial_interval: float=2,
+            max_interval: float=30,
+            factor: float=1.6,
+            jitter: float=0.2,
+            adaptive_ratio: float=0.1,
+            min_samples: int=3,
+        ):
+        self.max_wait_time = max_wait_time
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.jitter = jitter
+        self.adaptive_ratio = adaptive_ratio
+        self.min_samples = min_samples
+        self.started = time.monotonic()
+        self.deadline = self.started + max_wait_time
+        self.interval = initial_interval
+        self.durations = []
+        self.rounds = 0
+
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+
+    def observe(self, completed: int=0, durations: list=None) -> None:
+
+        """
+        Records the result of a polling round - "completed"
+        being the number of objects that finished this round.
+        "durations" are the seconds each took since it was
+        created, when known - else the time since the wait
+        started is used, skipping the first round.
+        """
+
+        self.rounds += 1
+        if durations is not None:
+            self.durations.extend(durations)
+        elif completed > 0 and self.rounds > 1:
+            self.durations.extend([self.elapsed()] * completed)
+        if completed > 0:
+            return
+
+        # no progress - backing off
+        self.interval = min(self.max_interval, self.interval * self.factor)
+
+
+    def next_interval(self) -> float:
+
+        """
+        Returns the seconds to sleep before the next round
+        """
+
+        interval = self.interval
+
+        # adapting to how long completed objects have taken
+        if len(self.durations) >= self.min_samples:
+            typical = statistics.median(self.durations) * self.adaptive_ratio
+            interval = min(interval, max(self.initial_interval, typical))
+
+        # spreading parallel pollers apart
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+
+        # never sleeping past the deadline
+        return max(0.0, min(interval, self.remaining()))
+
+
+    def wait(self) -> bool:
+
+        """
+        Sleeps until the next round. Returns False once
+        the deadline has been reached - a sleep cut short
+        by the deadline still returns True, so one final
+        round runs at the deadline
+        """
+
+        if self.expired():
+            return False
+        time.sleep(self.next_interval())
+        return True
@@ -0,0 +1,89 @@
+import hashlib, json
+
+
+
+
+def parse_shard(value: str) -> tuple:
+
+    """
+    Parses "K/N" into (K, N) - raises `ValueError`
+    unless 1 <= K <= N
+    """
+
+    try:
+        k, n = (int(part) for part in value.split('/'))
+    except (AttributeError, ValueError):
+        raise ValueError(f'shard must look like K/N (e.g. 2/4) - got {value!r}')
+    if not 1 <= k <= n:
+        raise ValueError(f'shard K/N needs 1 <= K <= N - got {value!r}')
+
+    return k, n
+
+
+
+
+def in_shard(page_id: str, shard: tuple) -> bool:
+
+    """
+    Returns whether "page_id" belongs to "shard" (K, N) -
+    stable across runs, machines & Python versions since
+    it hashes the id itself (not `hash()`, which is salted)
+    """
+
+    k, n = shard
+    digest = hashlib.sha256(str(page_id).encode()).digest()
+
+    return int.from_bytes(digest[:8], 'big') % n == k - 1
+
+
+
+
+def merge_results(files: list) -> dict:
+
+    """
+    Combines the result files written by each shard of
+    a `test-site --shard K/N` run into one verdict -
+    failing if any shard failed, ran out of budget or
+    is missing
+    """
+
+    shards = {}
+    site_ids = set()
+    counts = set()
+    for path in files:
+        with open(path) as f:
+            result = json.load(f)
+        k, n = parse_shard(result['shard'])
+        site_ids.add(result['site_id'])
+        counts.add(n)
+        shards[k] = result
+
+    if len(site_ids) > 1:
+        raise ValueError(f'result files are for different sites: {sorted(site_ids)}')
+    if len(counts) > 1:
+        raise ValueError(f'result files disagree on the shard count: {sorted(counts)}')
+
+    n = counts.pop() if counts else 0
+    records = [
+        record for result in shards.values() 
+        for record in result.get('results', [])
+    ]
+    tests = [record for record in records if record.get('kind') == 'test_result']
+    missing = [k for k in range(1, n + 1) if k not in shards]
+
+    return {
+        'site_id': site_ids.pop() if site_ids else None,
+        'shards': n,
+        'missing': missing,
+        'passed': len(shards) > 0 and len(missing) == 0 and all(
+            result['passed'] for result in shards.values()
+        ),
+        'exhausted': any(result.get('exhausted') for result in shards.values()),
+        'pages': sum(record['count'] for record in records if record.get('kind') == 'pages'),
+        'tests_passed': sum(1 for record in tests if record.get('passed')),
+        'tests_failed': sum(1 for record in tests if not record.get('passed')),
+        'by_shard': {
+            f'{k}/{n}': {'passed': shards[k]['passed'], 'run_id': shards[k].get('run_id')}
+            for k in sorted(shards)
+        },
+    }
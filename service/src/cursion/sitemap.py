@@ -0,0 +1,160 @@
+import gzip, io, os, sys
+import xml.etree.ElementTree as ElementTree
+from urllib.parse import urljoin
+from .transport import send_request
+
+# nested sitemap indexes followed at most this deep
+MAX_SITEMAP_DEPTH = 5
+GZIP_MAGIC = b'\x1f\x8b'
+
+# sitemaps.org schema - extension tags (e.g. <image:loc>)
+# live in their own namespaces & are skipped
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+
+
+def is_remote(source: str) -> bool:
+    return source.startswith(('http://', 'https://'))
+
+
+
+
+def open_source(source: str):
+
+    """
+    Opens "source" - a local path, an http(s) URL or "-"
+    for stdin - as a buffered binary stream, transparently
+    gunzipping it when it starts with the gzip magic bytes
+    """
+
+    if source == '-':
+        stream = sys.stdin.buffer
+    elif is_remote(source):
+        res = send_request('GET', url=source, stream=True)
+        res.raise_for_status()
+        res.raw.decode_content = True
+        stream = res.raw
+    else:
+        stream = open(source, 'rb')
+
+    stream = io.BufferedReader(stream) if not hasattr(stream, 'peek') else stream
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        stream = io.BufferedReader(gzip.GzipFile(fileobj=stream))
+
+    return stream
+
+
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+
+
+def is_sitemap_tag(tag: str, *names: str) -> bool:
+
+    """
+    Returns whether "tag" is one of "names" in the
+    sitemaps.org namespace (or in none, as some
+    hand-written sitemaps leave it out)
+    """
+
+    return any(tag in (f'{{{SITEMAP_NS}}}{name}', name) for name in names)
+
+
+
+
+def iter_sitemap(stream, source: str, depth: int=0):
+
+    """
+    Stream-parses a sitemap (or sitemap index) from
+    "stream" - yielding each `<url><loc>` as it is read,
+    following each `<sitemap><loc>` of an index, and
+    clearing parsed elements so memory stays constant.
+    Only a `<loc>` directly inside `<url>` / `<sitemap>`
+    counts - not e.g. an `<image:loc>`.
+    """
+
+    root = None
+    parents = []
+    for event, elem in ElementTree.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            parents.append(elem.tag)
+            continue
+
+        parents.pop()
+        parent = parents[-1] if len(parents) > 0 else ''
+        if is_sitemap_tag(elem.tag, 'loc') and is_sitemap_tag(parent, 'url', 'sitemap'):
+            loc = (elem.text or '').strip()
+            if not loc:
+                continue
+            if local_name(root.tag) == 'sitemapindex':
+                if depth >= MAX_SITEMAP_DEPTH:
+                    raise ValueError(f'sitemap index nested deeper than {MAX_SITEMAP_DEPTH} levels: {loc}')
+                yield from iter_urls(resolve(source, loc), depth=depth + 1)
+            else:
+                yield loc
+        elif is_sitemap_tag(elem.tag, 'url', 'sitemap'):
+            # dropping the finished entry from the tree
+            root.clear()
+
+
+
+
+def iter_lines(stream):
+
+    """
+    Yields each URL of a plain list - one per line,
+    skipping blanks & "#" comment lines
+    """
+
+    for line in stream:
+        line = line.decode('utf-8', errors='replace').strip().lstrip('\ufeff')
+        if line and not line.startswith('#'):
+            yield line
+
+
+
+
+def resolve(source: str, loc: str) -> str:
+
+    """
+    Resolves a nested sitemap "loc" against the sitemap
+    it was read from (local indexes may list relative paths)
+    """
+
+    if is_remote(loc) or source == '-':
+        return loc
+    if is_remote(source):
+        return urljoin(source, loc)
+
+    return os.path.join(os.path.dirname(source), loc)
+
+
+
+
+def iter_urls(source: str, depth: int=0):
+
+    """
+    Lazily yields every page URL in "source" - a plain
+    list of URLs or an XML sitemap / sitemap index,
+    optionally gzipped - read from a path, a URL or
+    stdin ("-"). The format is sniffed from the content.
+    """
+
+    stream = open_source(source)
+    try:
+        head = stream.peek(64).lstrip()
+        if head.startswith(b'\xef\xbb\xbf'):
+            head = head[3:].lstrip()
+        if head.startswith(b'<'):
+            yield from iter_sitemap(stream, source=source, depth=depth)
+        else:
+            yield from iter_lines(stream)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
@@ -0,0 +1,150 @@
+import atexit, json, re, threading, time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+_trace_file = None
+_trace_lock = threading.Lock()
+_listeners = []
+
+# path segments replaced by "{id}" when naming an endpoint
+ID_SEGMENT = re.compile(r'^([0-9a-fA-F-]{32,36}|\d+)$')
+
+
+
+
+def enable_trace(path: str) -> None:
+
+    """
+    Starts recording spans as JSON lines into "path"
+    (truncating it) until the process exits
+    """
+
+    global _trace_file
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.close()
+        _trace_file = open(path, 'w', buffering=1)
+    atexit.register(disable_trace)
+
+    return None
+
+
+
+
+def disable_trace() -> None:
+
+    """
+    Stops recording spans & closes the trace file
+    """
+
+    global _trace_file
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.close()
+        _trace_file = None
+
+    return None
+
+
+
+
+def add_listener(listener) -> None:
+
+    """
+    Calls "listener" with every span emitted from now on 
+    (e.g. to aggregate metrics) - trace file or not
+    """
+
+    # copy-on-write so `emit` never sees the list change
+    global _listeners
+    _listeners = [*_listeners, listener]
+
+    return None
+
+
+
+
+def remove_listener(listener) -> None:
+    global _listeners
+    _listeners = [l for l in _listeners if l is not listener]
+
+    return None
+
+
+
+
+def is_tracing() -> bool:
+    return _trace_file is not None or len(_listeners) > 0
+
+
+
+
+def get_endpoint(url: str) -> str:
+
+    """
+    Returns the path of "url" with any id segments
+    replaced by "{id}" - e.g. /v1/ops/scan/{id}
+    """
+
+    parts = urlsplit(url)
+    path = '/'.join(
+        '{id}' if ID_SEGMENT.match(segment) else segment
+        for segment in parts.path.split('/')
+    )
+
+    return f'{parts.netloc}{path}'
+
+
+
+
+def emit(kind: str, start: float, duration: float, **fields) -> None:
+
+    """
+    Hands one span to every listener & writes it to the
+    trace file - "start" is epoch seconds and "duration" 
+    is seconds, recorded as milliseconds
+    """
+
+    if not is_tracing():
+        return None
+
+    span = {
+        'kind': kind,
+        'start': round(start, 6),
+        'duration_ms': round(duration * 1000, 3),
+        'thread': threading.current_thread().name,
+        **fields
+    }
+    for listener in _listeners:
+        listener(span)
+    if _trace_file is None:
+        return None
+
+    line = json.dumps(span, default=str) + '\n'
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.write(line)
+
+    return None
+
+
+
+
+@contextmanager
+def span(kind: str, **fields):
+
+    """
+    Times the wrapped block as one span - yields the
+    span's fields so the block can add to them
+    """
+
+    if not is_tracing():
+        yield fields
+        return
+
+    start = time.time()
+    started = time.monotonic()
+    try:
+        yield fields
+    finally:
+        emit(kind, start=start, duration=time.monotonic() - started, **fields)
@@ -0,0 +1,510 @@
+import requests, threading, random, time, json
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+from .config import (
+    POOL_SIZE, MAX_RETRIES, CIRCUIT_THRESHOLD, CIRCUIT_COOLDOWN,
+    CONNECT_TIMEOUT, READ_TIMEOUT
+)
+from .tracing import is_tracing, span, get_endpoint
+
+_session = None
+_pool_size = POOL_SIZE
+_session_lock = threading.Lock()
+_in_flight = None
+
+# default (connect, read) seconds per request
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# retry configs
+RETRY_STATUSES = (429, 502, 503, 504)
+# statuses meaning the server refused - rather than 
+# maybe acted on - the request, so safe for POSTs too
+REFUSED_STATUSES = (429, 503)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+RETRY_AFTER_MAX = 60
+
+# process-wide retry & throttling counters
+stats = {
+    'requests': 0,
+    'retries': 0,
+    'throttled': 0,
+    'failures': 0,
+    'circuit_trips': 0,
+}
+_stats_lock = threading.Lock()
+_breakers = {}
+_breakers_lock = threading.Lock()
+_cancelled = threading.Event()
+
+
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+
+    """
+    Raised instead of sending a request to a host whose 
+    circuit breaker is open
+    """
+
+
+
+
+class RequestsCancelled(Exception):
+
+    """
+    Raised instead of sending a request once requests
+    were cancelled with `cancel_requests` - deliberately
+    not a `RequestException`, so pollers don't retry it
+    """
+
+
+
+
+class CircuitBreaker:
+
+    """
+    Counts consecutive failures (connection errors & 
+    502/503/504s) for one host. Once "threshold" is hit 
+    the circuit opens and calls fail fast for "cooldown"
+    seconds - after which a single trial call is let 
+    through, closing the circuit again if it succeeds.
+    """
+
+    def __init__(self, threshold: int=CIRCUIT_THRESHOLD, cooldown: float=CIRCUIT_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # half-open - holding others back until the trial returns
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    count('circuit_trips')
+                self.opened_at = time.monotonic()
+
+
+
+
+def count(name: str, n: int=1) -> None:
+    with _stats_lock:
+        stats[name] += n
+
+
+
+
+def get_stats() -> dict:
+
+    """
+    Returns a snapshot of the process-wide request,
+    retry & throttling counters
+    """
+
+    with _stats_lock:
+        return dict(stats)
+
+
+
+
+def reset_stats() -> None:
+
+    """
+    Zeroes the counters - e.g. between the commands a 
+    long-lived `cursion serve` daemon runs
+    """
+
+    with _stats_lock:
+        for name in stats:
+            stats[name] = 0
+
+    return None
+
+
+
+
+def cancel_requests(cancelled: bool=True) -> None:
+
+    """
+    Makes every later `send_request` in the process raise
+    `RequestsCancelled` - e.g. when the client of a
+    `cursion serve` command hung up. False lets them
+    through again.
+    """
+
+    if cancelled:
+        _cancelled.set()
+    else:
+        _cancelled.clear()
+
+    return None
+
+
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+
+    """
+    Returns the `CircuitBreaker` for the host of "url",
+    building it on first use
+    """
+
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+
+
+def is_connect_failure(error: Exception) -> bool:
+
+    """
+    True when "error" happened before the request could
+    reach the server - so even a POST is safe to resend
+    """
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+
+
+def get_retry_after(response: requests.Response) -> float:
+
+    """
+    Parses the "Retry-After" header of "response" (either
+    seconds or an HTTP date) - None when absent or invalid
+    """
+
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+
+
+def get_backoff(attempt: int, retry_after: float=None) -> float:
+
+    """
+    Returns the seconds to wait before retry "attempt" - 
+    "retry_after" when the server sent one, else capped 
+    exponential backoff with jitter
+    """
+
+    if retry_after is not None:
+        return min(RETRY_AFTER_MAX, retry_after)
+
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1)
+
+
+
+
+def build_adapter(pool_size: int=POOL_SIZE) -> HTTPAdapter:
+    return HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        pool_block=False,
+    )
+
+
+
+
+def build_session(pool_size: int=POOL_SIZE) -> requests.Session:
+
+    """
+    Builds a new `requests.Session` with a keep-alive
+    connection pool of "pool_size" sockets per host.
+    Re-used connections also re-use their TLS session,
+    so only the first call to a host pays the handshake.
+    """
+
+    # setup adapter
+    adapter = build_adapter(pool_size=pool_size)
+
+    # build session
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Connection': 'keep-alive'
+    })
+
+    return session
+
+
+
+
+def get_session() -> requests.Session:
+
+    """
+    Returns the process-wide pooled `requests.Session`,
+    building it on first use
+    """
+
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session(pool_size=_pool_size)
+
+    return _session
+
+
+
+
+def configure_session(pool_size: int=POOL_SIZE) -> requests.Session:
+
+    """
+    Replaces the process-wide session with a new one
+    using the passed "pool_size"
+    """
+
+    global _session, _pool_size
+    with _session_lock:
+        _pool_size = pool_size
+        if _session is not None:
+            _session.close()
+        _session = build_session(pool_size=pool_size)
+
+    return _session
+
+
+
+
+def send_once(method: str, url: str, **kwargs) -> requests.Response:
+
+    """
+    Sends a single request through the process-wide 
+    pooled session, within the in-flight cap (if any)
+    """
+
+    # capping requests in flight across all threads
+    if _in_flight is not None:
+        with _in_flight:
+            return get_session().request(method=method, url=url, **kwargs)
+
+    # send the request
+    res = get_session().request(
+        method=method,
+        url=url,
+        **kwargs
+    )
+
+    return res
+
+
+
+
+def send_with_retries(
+        method: str, 
+        url: str, 
+        retries: int=MAX_RETRIES, 
+        circuit: bool=True, 
+        fields: dict=None,
+        **kwargs
+    ) -> requests.Response:
+
+    """
+    Sends a request, retrying throttled (429) and
+    unavailable (502/503/504) responses and connection
+    errors up to "retries" times - honoring "Retry-After",
+    else with capped exponential backoff. Non-idempotent
+    methods (POST) are only retried when the server cannot
+    have acted on them: a 429, a 503 or a failure to 
+    connect. Unless "circuit" is False, calls to a host 
+    that keeps failing trip its `CircuitBreaker` and raise
+    `CircuitOpenError` until it cools down. The retry count
+    is recorded in "fields" (a trace span) when passed.
+    """
+
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    breaker = get_breaker(url) if circuit else None
+    attempt = 0
+    while True:
+        if fields is not None:
+            fields['retries'] = attempt
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(
+                f'circuit open for {urlsplit(url).netloc} - '
+                f'{breaker.failures} consecutive failures'
+            )
+
+        count('requests')
+        try:
+            res = send_once(method=method, url=url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+            count('failures')
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt >= retries or not (idempotent or is_connect_failure(error)):
+                raise
+            delay = get_backoff(attempt=attempt)
+        else:
+            if res.status_code not in RETRY_STATUSES:
+                if breaker is not None:
+                    breaker.record_success()
+                return res
+
+            # a 429 means the API is up - just busy
+            if res.status_code == 429:
+                count('throttled')
+            else:
+                count('failures')
+                if breaker is not None:
+                    breaker.record_failure()
+            if attempt >= retries or not (idempotent or res.status_code in REFUSED_STATUSES):
+                return res
+            delay = get_backoff(attempt=attempt, retry_after=get_retry_after(res))
+            res.close()
+
+        # waiting before next attempt
+        count('retries')
+        time.sleep(delay)
+        attempt += 1
+
+
+
+
+def get_body_size(kwargs: dict) -> int:
+
+    """
+    Returns the bytes sent as the body of a request
+    built from "kwargs"
+    """
+
+    data = kwargs.get('data')
+    if data is None and kwargs.get('json') is not None:
+        data = json.dumps(kwargs['json'])
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    if isinstance(data, bytes):
+        return len(data)
+    return 0
+
+
+
+
+def send_request(method: str, url: str, **kwargs) -> requests.Response:
+
+    """
+    Sends a request through the process-wide pooled
+    session. Every api_* call goes through here.
+    Requests without a "timeout" get `DEFAULT_TIMEOUT`,
+    so a stalled socket can never hang a run. Failures
+    are retried by `send_with_retries` and, while tracing,
+    each call (incl. its retries) is recorded as one span.
+    """
+
+    # refusing new work once the run was cancelled
+    if _cancelled.is_set():
+        raise RequestsCancelled(f'- request cancelled: {method.upper()} {get_endpoint(url)} -')
+
+    # never waiting on a socket forever
+    if kwargs.get('timeout') is None:
+        kwargs['timeout'] = DEFAULT_TIMEOUT
+
+    if not is_tracing():
+        return send_with_retries(method=method, url=url, **kwargs)
+
+    # recording the call as a trace span
+    with span(
+            'http', 
+            endpoint=get_endpoint(url), 
+            method=method.upper(),
+            bytes_out=get_body_size(kwargs)
+        ) as fields:
+        try:
+            res = send_with_retries(method=method, url=url, fields=fields, **kwargs)
+        except requests.RequestException as error:
+            fields['error'] = type(error).__name__
+            raise
+        fields['status'] = res.status_code
+        fields['bytes_in'] = (
+            int(res.headers.get('Content-Length') or 0) 
+            if kwargs.get('stream') else len(res.content)
+        )
+
+    return res
+
+
+
+
+def ensure_pool_size(pool_size: int) -> requests.Session:
+
+    """
+    Grows the process-wide session's pool when more than
+    "pool_size" calls may be in flight at once - in place,
+    by mounting a larger adapter on the same session. The
+    old adapter is closed: its idle sockets right away, 
+    those still in flight as soon as they are released.
+    """
+
+    global _pool_size
+    session = get_session()
+    if pool_size <= _pool_size:
+        return session
+
+    with _session_lock:
+        if pool_size > _pool_size:
+            old = session.get_adapter('https://')
+            adapter = build_adapter(pool_size=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            old.close()
+            _pool_size = pool_size
+
+    return session
+
+
+
+
+def set_max_in_flight(max_in_flight: int=None) -> None:
+
+    """
+    Caps the number of requests in flight at once across 
+    every thread in the process - None removes the cap
+    """
+
+    global _in_flight
+    _in_flight = (
+        threading.BoundedSemaphore(max_in_flight) 
+        if max_in_flight is not None else None
+    )
+    ensure_pool_size(max_in_flight or 0)
+
+    return None
@@ -0,0 +1,61 @@
+"""
+Shared fixtures - every test runs against one bundled
+mock Cursion API (see `src/cursion/mock.py`) with an
+isolated $HOME, so no network or config is touched.
+"""
+
+import os, tempfile, threading
+import pytest
+
+from src.cursion.mock import build_mock_server
+
+# started in `pytest_configure` - before any test module
+# imports `src.cursion.config`, which reads the env once
+MOCK = {}
+
+
+
+
+def pytest_configure(config):
+    os.environ['HOME'] = tempfile.mkdtemp(prefix='cursion-home-')
+    server = build_mock_server(port=0, pages=0, delay=0.2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['API_ROOT'] = server.state.root
+    os.environ['API_KEY'] = 'mock-key-0000000000000000'
+    MOCK['server'] = server
+
+
+
+
+def pytest_unconfigure(config):
+    if 'server' in MOCK:
+        MOCK['server'].shutdown()
+        MOCK['server'].server_close()
+
+
+
+
+@pytest.fixture
+def mock():
+
+    """
+    Returns the mock's `MockState` - with its completion
+    delay & scripted failures reset after each test
+    """
+
+    state = MOCK['server'].state
+    yield state
+    state.delay = 0.2
+    state.scripted.clear()
+
+
+
+
+@pytest.fixture
+def site(mock):
+
+    """
+    Adds a fresh `Site` of 4 `Pages` to the mock
+    """
+
+    return mock.add_site(page_count=4)
@@ -0,0 +1,29 @@
+"""
+`AsyncCursionClient.test_site` against the mock - a
+failed create only fails its own `Page`.
+"""
+
+import asyncio
+import pytest
+
+pytest.importorskip('httpx')
+
+from src.cursion.aio import AsyncCursionClient
+
+
+
+
+async def run_test_site(mock, site_id: str) -> bool:
+    async with AsyncCursionClient(api_root=mock.root) as client:
+        return await client.test_site(site_id=site_id, max_wait_time=30)
+
+
+
+
+def test_failed_test_post_fails_only_its_page(mock, site):
+    mock.fail_next('POST /v1/ops/test', 502)
+
+    assert asyncio.run(run_test_site(mock, site_id=site['id'])) is False
+
+    pages = {id for id, page in mock.pages.items() if page['site'] == site['id']}
+    assert len([test for test in mock.tests.values() if test['page'] in pages]) == 3
@@ -0,0 +1,109 @@
+"""
+`api_test_site` against the mock - a failed create only
+fails its own `Page`, and a run that runs out of time
+stops with `BudgetExhausted` / `PhaseTimedOut`.
+"""
+
+import pytest
+
+from src.cursion.api import api_test_site
+from src.cursion.budget import BudgetExhausted, RunBudget
+from src.cursion.runs import PhaseTimedOut, RunCheckpoint
+
+
+
+
+def routes(mock) -> dict:
+    with mock.lock:
+        return dict(mock.stats['routes'])
+
+
+
+
+def site_tests(mock, site) -> int:
+    pages = {id for id, page in mock.pages.items() if page['site'] == site['id']}
+    return len([test for test in mock.tests.values() if test['page'] in pages])
+
+
+
+
+def created(before: dict, after: dict, route: str) -> int:
+    return after.get(route, 0) - before.get(route, 0)
+
+
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_failed_test_post_fails_only_its_page(mock, site, pipeline):
+    mock.fail_next('POST /v1/ops/test', 502)
+    before = routes(mock)
+
+    passed = api_test_site(site_id=site['id'], max_wait_time=30, pipeline=pipeline)
+
+    after = routes(mock)
+    assert passed is False
+    # the failed POST plus one `Test` per other `Page`
+    assert created(before, after, 'POST /v1/ops/test') == 4
+    assert site_tests(mock, site) == 3
+
+
+
+
+# phased runs post-scan the whole `Site` in one request
+@pytest.mark.parametrize('pipeline, tested', [(False, 0), (True, 3)])
+def test_failed_scan_post(mock, site, pipeline, tested):
+    mock.fail_next('POST /v1/ops/scan', 502)
+
+    passed = api_test_site(site_id=site['id'], max_wait_time=30, pipeline=pipeline)
+
+    assert passed is False
+    assert site_tests(mock, site) == tested
+
+
+
+
+def test_passing_run(mock, site):
+    assert api_test_site(site_id=site['id'], max_wait_time=30) is True
+
+
+
+
+def test_budget_exhausted_before_creating(mock):
+    mock.delay = 3
+    site = mock.add_site(page_count=4)
+    before = routes(mock)
+
+    with pytest.raises(BudgetExhausted) as error:
+        api_test_site(site_id=site['id'], budget=1.5)
+
+    after = routes(mock)
+    assert error.value.phase == 'pre_scan'
+    assert created(before, after, 'POST /v1/ops/scan') == 0
+    assert created(before, after, 'POST /v1/ops/test') == 0
+
+
+
+
+def test_phase_may_overrun_its_share(mock):
+    mock.delay = 1
+    site = mock.add_site(page_count=4)
+    budget = RunBudget(
+        total=15,
+        shares={'availability': 0.01, 'pre_scan': 0.01, 'post_scan': 0.49, 'test': 0.49}
+    )
+
+    assert api_test_site(site_id=site['id'], budget=budget) is True
+
+
+
+
+def test_phase_timeout_keeps_checkpoint(mock):
+    mock.delay = 3
+    site = mock.add_site(page_count=4)
+
+    with pytest.raises(PhaseTimedOut) as error:
+        api_test_site(site_id=site['id'], max_wait_time=1, run_id='timeout-run')
+
+    assert error.value.phase == 'pre_scan'
+    assert error.value.pending == 4
+    assert RunCheckpoint.load('timeout-run').get('site_id') == site['id']
@@ -0,0 +1,83 @@
+"""
+`forward` runs commands in a live `cursion serve` - and
+falls back to running in-process once the config the
+daemon read has changed.
+"""
+
+import os, subprocess, sys, tempfile, time
+from pathlib import Path
+import pytest
+
+from src.cursion import daemon
+
+SERVICE = Path(__file__).resolve().parents[1]
+
+
+
+
+@pytest.fixture
+def served():
+
+    """
+    Starts `cursion serve` on a short-lived socket - with
+    a `cursion config` .env in place - and yields its path
+    """
+
+    daemon.ENV_FILE.parent.mkdir(parents=True, exist_ok=True)
+    daemon.ENV_FILE.write_text(f'API_ROOT={os.environ["API_ROOT"]}\n')
+    socket_path = os.path.join(tempfile.mkdtemp(prefix='cursion-'), 'cursion.sock')
+    process = subprocess.Popen(
+        [
+            sys.executable, '-c',
+            'import sys; from src.cursion.root import app; '
+            'from src.cursion.daemon import serve; serve(app, socket_path=sys.argv[1])',
+            socket_path
+        ],
+        cwd=SERVICE, stdout=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.1)
+        yield socket_path
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        daemon.ENV_FILE.unlink()
+
+
+
+
+def test_socket_is_owner_only(served):
+    assert os.stat(served).st_mode & 0o777 == 0o700
+
+
+
+
+def test_forwards_command(served, capsys):
+    assert daemon.forward(['get-sites', '--output', 'json'], socket_path=served) == 0
+    assert '"site_url"' in capsys.readouterr().out
+
+
+
+
+def test_falls_back_after_config_change(served):
+    daemon.ENV_FILE.write_text(f'API_ROOT={os.environ["API_ROOT"]}\nAPI_KEY=rotated\n')
+
+    assert daemon.forward(['get-sites'], socket_path=served) is None
+
+
+
+
+def test_falls_back_on_other_environment(served, monkeypatch):
+    monkeypatch.setenv('API_KEY', 'another-key')
+
+    assert daemon.forward(['get-sites'], socket_path=served) is None
+
+
+
+
+def test_local_commands_are_not_forwarded(served):
+    assert daemon.forward(['config', '--api-key', 'key'], socket_path=served) is None
+    assert daemon.forward(['test-site', 'id', '--urls', '-'], socket_path=served) is None
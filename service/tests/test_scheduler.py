@@ -0,0 +1,39 @@
+"""
+`PollScheduler` backs off until enough real completion
+times were seen - first-round completions don't count.
+"""
+
+from src.cursion.scheduler import PollScheduler
+
+
+
+
+def test_first_round_completions_are_not_samples():
+    scheduler = PollScheduler(jitter=0)
+    scheduler.observe(completed=50)
+
+    assert scheduler.durations == []
+
+
+
+
+def test_backs_off_without_progress():
+    scheduler = PollScheduler(jitter=0)
+    scheduler.observe(completed=50)
+    scheduler.observe(completed=0)
+    scheduler.observe(completed=0)
+
+    assert scheduler.next_interval() == 2 * 1.6 * 1.6
+
+
+
+
+def test_caps_interval_once_sampled():
+    scheduler = PollScheduler(jitter=0, min_samples=3)
+    for _ in range(5):
+        scheduler.observe(completed=0)
+    scheduler.observe(completed=2, durations=[40, 40])
+
+    assert scheduler.next_interval() > 4
+    scheduler.observe(completed=1, durations=[40])
+    assert scheduler.next_interval() == 4
@@ -0,0 +1,63 @@
+"""
+`iter_urls` only imports `<loc>`s of `<url>` / `<sitemap>`
+entries - never extension tags such as `<image:loc>`.
+"""
+
+from src.cursion.sitemap import iter_urls
+
+
+
+
+def write(path, text: str) -> str:
+    path.write_text(text)
+    return str(path)
+
+
+
+
+def test_skips_extension_locs(tmp_path):
+    source = write(tmp_path / 'sitemap.xml', """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"
+        xmlns:video="http://www.google.com/schemas/sitemap-video/1.1">
+  <url>
+    <loc>https://a.com/p</loc>
+    <image:image><image:loc>https://a.com/p.png</image:loc></image:image>
+    <video:video><video:content_loc>https://a.com/p.mp4</video:content_loc></video:video>
+  </url>
+  <url><loc> https://a.com/q </loc></url>
+</urlset>""")
+
+    assert list(iter_urls(source)) == ['https://a.com/p', 'https://a.com/q']
+
+
+
+
+def test_accepts_unnamespaced_sitemap(tmp_path):
+    source = write(tmp_path / 'sitemap.xml', """<urlset>
+  <url><loc>https://a.com/p</loc></url>
+</urlset>""")
+
+    assert list(iter_urls(source)) == ['https://a.com/p']
+
+
+
+
+def test_follows_index(tmp_path):
+    write(tmp_path / 'pages.xml', """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+  <url><loc>https://a.com/p</loc><image:image><image:loc>https://a.com/p.png</image:loc></image:image></url>
+</urlset>""")
+    source = write(tmp_path / 'index.xml', """<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>pages.xml</loc></sitemap>
+</sitemapindex>""")
+
+    assert list(iter_urls(source)) == ['https://a.com/p']
+
+
+
+
+def test_plain_list(tmp_path):
+    source = write(tmp_path / 'urls.txt', '# pages\nhttps://a.com/p\n\nhttps://a.com/q\n')
+
+    assert list(iter_urls(source)) == ['https://a.com/p', 'https://a.com/q']